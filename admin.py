@@ -1,15 +1,17 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, send_from_directory
+from werkzeug.utils import safe_join
 from models import Role, User
 from bson.objectid import ObjectId
-from auth import token_required
+from auth import token_required, invalidate_principal, current_permissions
+from invalidation import record_deletion
+import datetime
+import os
 
 admin_bp = Blueprint('admin', __name__)
 
 # Helper: Check if user is admin
 def is_admin(role_id):
-    from app import mongo
-    role = mongo.db.roles.find_one({'_id': ObjectId(role_id)})
-    return role and role['name'] == 'Admin'
+    return current_permissions(role_id=role_id).is_admin
 
 # all roles
 @admin_bp.route('/roles', methods=['GET'])
@@ -48,9 +50,10 @@ def update_role(email,user_id, role_id, role_id_param):
         return jsonify({'msg': 'Admin only'}), 403
     data = request.get_json()
     permissions = data.get('permissions', [])
-    result = mongo.db.roles.update_one({'_id': ObjectId(role_id_param)}, {'$set': {'permissions': permissions}})
+    result = mongo.db.roles.update_one({'_id': ObjectId(role_id_param)}, {'$set': {'permissions': permissions, 'updated_at': datetime.datetime.utcnow()}})
     if result.matched_count == 0:
         return jsonify({'msg': 'Role not found'}), 404
+    invalidate_principal(role_id=role_id_param)
     return jsonify({'msg': 'Role updated'})
 
 # Delete a role
@@ -63,6 +66,8 @@ def delete_role(email,user_id, role_id, role_id_param):
     result = mongo.db.roles.delete_one({'_id': ObjectId(role_id_param)})
     if result.deleted_count == 0:
         return jsonify({'msg': 'Role not found'}), 404
+    invalidate_principal(role_id=role_id_param)
+    record_deletion(mongo, 'roles', role_id_param)
     return jsonify({'msg': 'Role deleted'})
 
 # Assign role to user
@@ -74,7 +79,30 @@ def assign_role(email,user_id, role_id, user_id_param):
         return jsonify({'msg': 'Admin only'}), 403
     data = request.get_json()
     new_role_id = data.get('role_id')
-    result = mongo.db.users.update_one({'_id': ObjectId(user_id_param)}, {'$set': {'role_id': ObjectId(new_role_id)}})
+    result = mongo.db.users.update_one({'_id': ObjectId(user_id_param)}, {'$set': {'role_id': ObjectId(new_role_id), 'updated_at': datetime.datetime.utcnow()}})
     if result.matched_count == 0:
         return jsonify({'msg': 'User not found'}), 404
-    return jsonify({'msg': 'Role assigned'}) 
\ No newline at end of file
+    invalidate_principal(user_id=user_id_param)
+    return jsonify({'msg': 'Role assigned'}) 
+
+
+# List captured request profiles (newest first)
+@admin_bp.route('/profiles', methods=['GET'])
+@token_required
+def list_profiles(email, user_id, role_id):
+    from profiler import profile_store
+    if not is_admin(role_id):
+        return jsonify({'msg': 'Admin only'}), 403
+    return jsonify(profile_store.list())
+
+
+# Download one profile as collapsed stacks (flamegraph.pl / speedscope input)
+@admin_bp.route('/profiles/<name>', methods=['GET'])
+@token_required
+def get_profile(email, user_id, role_id, name):
+    from profiler import profile_store
+    if not is_admin(role_id):
+        return jsonify({'msg': 'Admin only'}), 403
+    if not name.endswith('.folded') or not os.path.isfile(safe_join(profile_store.directory, name) or ''):
+        return jsonify({'msg': 'Profile not found'}), 404
+    return send_from_directory(profile_store.directory, name, mimetype='text/plain')
@@ -1,32 +1,119 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context
 from models import Website
+from auth import token_required, can_edit_website, current_permissions
+from middleware import rate_limit_by_user, charge_rate_limit
+from jobs import job_queue
+from generation_cache import generation_cache
+from json_stream import SectionStreamParser, extract_json, extract_members
+from website import website_changed
+from versioning import (VersionConflict, diff_paths, diff_values, expected_version_from_request,
+                        update_website_versioned, version_conflict_response, website_etag)
+from metrics import record_ai_call, AI_RETRIES, AI_REPAIRS
 from bson.objectid import ObjectId
-from auth import token_required, can_edit_website
-import google.generativeai as genai
+from pymongo.errors import BulkWriteError
 import os
 from dotenv import load_dotenv
+import copy
 import json
+import random
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Load environment variables
 load_dotenv('config.env')
 
 ai_bp = Blueprint('ai', __name__)
 
-# Configure Gemini
-try:
-    genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-    model = genai.GenerativeModel('gemini-1.5-flash')
-except Exception as e:
-    print(f"Could not configure Gemini: {e}", file=sys.stderr)
-    model = None
+def create_model():
+    """Build the AI backend selected by AI_BACKEND ('gemini' or the offline 'fake')."""
+    if os.getenv('AI_BACKEND', 'gemini') == 'fake':
+        from fake_model import FakeGenerativeModel
+        # FAKE_AI_LATENCY is seconds, or a "min-max" range such as "2-10"
+        latency = os.getenv('FAKE_AI_LATENCY', '0')
+        if '-' in latency:
+            low, high = latency.split('-', 1)
+            return FakeGenerativeModel(latency_range=(float(low), float(high)))
+        return FakeGenerativeModel(latency=float(latency))
+    # Imported here: google.generativeai dominates cold-start time and most routes never need it
+    import google.generativeai as genai
+    # GEMINI_TRANSPORT=rest keeps calls cooperative under gevent/eventlet workers
+    genai.configure(api_key=os.getenv('GEMINI_API_KEY'), transport=os.getenv('GEMINI_TRANSPORT') or None)
+    return genai.GenerativeModel('gemini-1.5-flash')
 
-def generate_website_content_gemini(business_type, industry, description=""):
-    """Generate website content using Gemini"""
-    if not model:
-        return None
-        
-    prompt = f"""
+
+_UNSET = object()
+_model = _UNSET
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """Return the AI backend, constructing it on first use (thread-safe). None if unavailable."""
+    global _model
+    if _model is _UNSET:
+        with _model_lock:
+            if _model is _UNSET:
+                try:
+                    _model = create_model()
+                except Exception as e:
+                    print(f"Could not configure Gemini: {e}", file=sys.stderr)
+                    _model = None
+    return _model
+
+
+def set_model(new_model):
+    """Swap the AI backend at runtime (e.g. a FakeGenerativeModel in benchmarks)."""
+    global _model
+    with _model_lock:
+        _model = new_model
+
+
+# Part of the generation cache key: bump when the prompt or the form of cached content changes
+# (2: validated, repaired sections in SECTION_KEYS order rather than raw model text)
+PROMPT_VERSION = 2
+
+AI_RATE_LIMIT = os.getenv('AI_RATE_LIMIT', '10 per hour')
+
+# Batch generation (agency onboarding): one job per request, up to MAX_BATCH_GENERATIONS businesses.
+# Batches draw on their own per-user quota, charged one hit per distinct business (i.e. per model call)
+MAX_BATCH_GENERATIONS = 500
+AI_BATCH_RATE_LIMIT = os.getenv('AI_BATCH_RATE_LIMIT', '1000 per day')
+AI_BATCH_CONCURRENCY = int(os.getenv('AI_BATCH_CONCURRENCY', 8))
+AI_BATCH_RETRIES = int(os.getenv('AI_BATCH_RETRIES', 3))
+AI_RETRY_BASE_DELAY = float(os.getenv('AI_RETRY_BASE_DELAY', 1.0))
+AI_RETRY_MAX_DELAY = 30.0
+
+# google.api_core exceptions for rate limiting, overload and timeouts, matched by name
+# so google.generativeai stays a lazy import
+TRANSIENT_MODEL_ERRORS = {'ResourceExhausted', 'TooManyRequests', 'ServiceUnavailable', 'InternalServerError',
+                          'BadGateway', 'GatewayTimeout', 'DeadlineExceeded'}
+
+SECTION_KEYS = ('hero_section', 'about_section', 'services_section', 'contact_section')
+
+SECTION_SHAPES = {
+    'hero_section': 'an object with "heading" and "subheading"',
+    'about_section': 'an object with "title" and "content"',
+    'services_section': 'an array of 3-5 objects, each with "name" and "description"',
+    'contact_section': 'an object with "title" and "content"'
+}
+
+# What each section must decode to: (object or array of objects, required non-empty string fields)
+SECTION_SCHEMA = {
+    'hero_section': (dict, ('heading', 'subheading')),
+    'about_section': (dict, ('title', 'content')),
+    'services_section': (list, ('name', 'description')),
+    'contact_section': (dict, ('title', 'content'))
+}
+
+SECTION_PROMPT_TEMPLATE = """
+    Create professional website content for a {business_type} business in the {industry} industry.
+    Business description: {description}
+    Generate only the "{section}" part of the website: {shape}.
+    Return only that JSON value, without any additional text or markdown formatting.
+    """
+
+PROMPT_TEMPLATE = """
     Create professional website content for a {business_type} business in the {industry} industry.
     Business description: {description}
     Generate a JSON structure with the following keys:
@@ -36,25 +123,313 @@ def generate_website_content_gemini(business_type, industry, description=""):
     4. "contact_section" (an object with "title" and "content")
     Return only valid JSON without any additional text or markdown formatting. The keys must be exactly "hero_section", "about_section", "services_section", and "contact_section".
     """
+
+
+class InvalidModelOutput(ValueError):
+    """The model answered, but its output could not be turned into valid website content."""
+
+
+def section_error(section, value):
+    """Why value does not fit the section's schema, or None if it does."""
+    kind, fields = SECTION_SCHEMA[section]
+    items = value if kind is list else [value]
+    if not isinstance(value, kind) or not items:
+        return f'expected {SECTION_SHAPES[section]}'
+    for item in items:
+        if not isinstance(item, dict) or any(not isinstance(item.get(f), str) or not item[f].strip()
+                                             for f in fields):
+            return f'expected {SECTION_SHAPES[section]}'
+    return None
+
+
+def validate_sections(candidates, decode_errors=None):
+    """Split decoded sections into (valid {section: value}, {section: reason} for the rest)."""
+    sections, invalid = {}, {}
+    for section in SECTION_KEYS:
+        if section not in candidates:
+            invalid[section] = (decode_errors or {}).get(section, 'missing')
+            continue
+        error = section_error(section, candidates[section])
+        if error:
+            invalid[section] = error
+        else:
+            sections[section] = candidates[section]
+    return sections, invalid
+
+
+def parse_website_content(text):
+    """Pull the website sections out of raw model output.
+
+    The first JSON object holding any section key wins, wherever it sits in the
+    text. If there is none (the document itself is malformed), each section that
+    still decodes on its own is salvaged. Returns validate_sections() output.
+    """
     try:
-        response = model.generate_content(prompt)
-        content = response.text.strip()
+        candidates = extract_json(text, lambda value: isinstance(value, dict)
+                                  and any(section in value for section in SECTION_KEYS))
+    except ValueError:
+        return validate_sections(*extract_members(text, SECTION_KEYS))
+    return validate_sections(candidates)
+
+
+def repair_sections(sections, invalid, business_type, industry, description=""):
+    """Re-request only the invalid sections. Returns the complete sections, or None if a repair failed."""
+    for section, reason in invalid.items():
+        print(f"Repairing {section} of AI-generated content: {reason}", file=sys.stderr)
+        AI_REPAIRS.inc(section)
+    repaired, failed = generate_sections_concurrently(list(invalid), business_type, industry, description)
+    if failed:
+        return None
+    sections = dict(sections, **repaired)
+    return {section: sections[section] for section in SECTION_KEYS}
+
+
+def generate_website_content_gemini(business_type, industry, description="", use_cache=True, raise_errors=False):
+    """Generate website content using Gemini, as a JSON string of the validated sections.
+
+    Sections missing from or malformed in the model output are re-requested on
+    their own rather than regenerating the whole site. Results are memoized in the
+    generation cache; use_cache=False skips the lookup (the fresh result still
+    replaces the cached one). Failures return None, or propagate with
+    raise_errors=True so callers can decide whether to retry.
+    """
+    from app import mongo
+    cache_key = generation_cache.key(PROMPT_VERSION, business_type, industry, description)
+    if use_cache:
+        cached = generation_cache.get(mongo, cache_key)
+        if cached:
+            return cached
+
+    model = get_model()
+    if not model:
+        if raise_errors:
+            raise RuntimeError('AI model is not configured')
+        return None
         
-        if content.startswith('```json'):
-            content = content[7:]
-        if content.startswith('```'):
-            content = content[3:]
-        if content.endswith('```'):
-            content = content[:-3]
-        content = content.strip()
-        return content
+    prompt = PROMPT_TEMPLATE.format(business_type=business_type, industry=industry, description=description)
+    started_at = time.perf_counter()
+    try:
+        response = model.generate_content(prompt)
+        text = response.text
     except Exception as e:
+        record_ai_call('generate_website', started_at, 'error')
         print(f"Gemini API Error: {e}", file=sys.stderr)
+        if raise_errors:
+            raise
+        return None
+    record_ai_call('generate_website', started_at, 'success', response)
+
+    sections, invalid = parse_website_content(text)
+    if invalid:
+        sections = repair_sections(sections, invalid, business_type, industry, description)
+        if sections is None:
+            if raise_errors:
+                raise InvalidModelOutput(f"Could not repair {', '.join(invalid)}")
+            return None
+    content = json.dumps(sections)
+    generation_cache.set(mongo, cache_key, content)
+    return content
+
+
+def generate_section_gemini(section, business_type, industry, description=""):
+    """Generate a single section with its own prompt. Returns the validated value or None."""
+    model = get_model()
+    if not model:
+        return None
+    prompt = SECTION_PROMPT_TEMPLATE.format(business_type=business_type, industry=industry,
+                                            description=description, section=section,
+                                            shape=SECTION_SHAPES[section])
+    started_at = time.perf_counter()
+    try:
+        response = model.generate_content(prompt)
+        text = response.text
+    except Exception as e:
+        record_ai_call('generate_section', started_at, 'error')
+        print(f"Gemini API Error ({section}): {e}", file=sys.stderr)
         return None
+    record_ai_call('generate_section', started_at, 'success', response)
+
+    try:
+        value = extract_json(text)
+    except ValueError as e:
+        print(f"Invalid AI output for {section}: {e}", file=sys.stderr)
+        return None
+    # Models sometimes wrap the value in its section key
+    if isinstance(value, dict) and list(value) == [section]:
+        value = value[section]
+    error = section_error(section, value)
+    if error:
+        print(f"Invalid AI output for {section}: {error}", file=sys.stderr)
+        return None
+    return value
+
+
+def generate_sections_concurrently(sections, business_type, industry, description=""):
+    """Generate the given sections in parallel. Returns ({section: value}, [failed sections])."""
+    with ThreadPoolExecutor(max_workers=len(sections), thread_name_prefix='ai-section') as pool:
+        futures = {
+            section: pool.submit(generate_section_gemini, section, business_type, industry, description)
+            for section in sections
+        }
+        results = {section: future.result() for section, future in futures.items()}
+    failed = [section for section, value in results.items() if value is None]
+    return {section: value for section, value in results.items() if value is not None}, failed
+
+
+def stream_website_content_gemini(business_type, industry, description=""):
+    """Yield raw text chunks from the model's streaming mode."""
+    prompt = PROMPT_TEMPLATE.format(business_type=business_type, industry=industry, description=description)
+    started_at = time.perf_counter()
+    chunk = None
+    try:
+        for chunk in get_model().generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+    except Exception:
+        record_ai_call('stream_website', started_at, 'error')
+        raise
+    # Streaming responses report usage on the final chunk
+    record_ai_call('stream_website', started_at, 'success', chunk)
+
+
+def sse_event(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+
+def ai_metadata(business_type, industry, description):
+    return {
+        'business_type': business_type,
+        'industry': industry,
+        'description': description,
+        'generated_by_ai': True,
+        'ai_model': 'gemini'
+    }
+
+
+def run_generation_job(owner_id, business_type, industry, description, use_cache=True):
+    """Job body for queued generation: call the model and persist the website."""
+    from app import mongo
+    generated_content = generate_website_content_gemini(business_type, industry, description, use_cache)
+    if not generated_content:
+        raise RuntimeError('Failed to generate content')
+
+    website_data = json.loads(generated_content)
+    website_data['metadata'] = ai_metadata(business_type, industry, description)
+    result = Website(owner_id, website_data).save(mongo)
+    website_changed(mongo)
+    return {'website_id': str(result.inserted_id)}
+
+
+def is_transient_error(error):
+    # A fresh sample usually fixes output whose repair also failed, so it is retried like an outage
+    if isinstance(error, (TimeoutError, ConnectionError, InvalidModelOutput)):
+        return True
+    return type(error).__name__ in TRANSIENT_MODEL_ERRORS
+
+
+def generate_with_retry(business_type, industry, description="", use_cache=True,
+                        retries=AI_BATCH_RETRIES, base_delay=AI_RETRY_BASE_DELAY):
+    """Generate and decode website content, retrying transient errors with jittered exponential backoff."""
+    for attempt in range(retries + 1):
+        try:
+            content = generate_website_content_gemini(business_type, industry, description, use_cache,
+                                                      raise_errors=True)
+            return json.loads(content)
+        except Exception as e:
+            if attempt == retries or not is_transient_error(e):
+                raise
+            AI_RETRIES.inc('generate_website')
+            # Full jitter spreads a batch's retries out instead of hitting the API in lockstep
+            time.sleep(random.uniform(0, min(AI_RETRY_MAX_DELAY, base_delay * 2 ** attempt)))
+
+
+def batch_key(business):
+    """Identity of a batch item; inputs differing only in case or whitespace share one generation."""
+    return generation_cache.key(PROMPT_VERSION, business['business_type'], business['industry'],
+                                business.get('description', ''))
+
+
+def run_batch_generation_job(owner_id, businesses, use_cache=True):
+    """Job body for batch generation.
+
+    Each distinct business is generated once, AI_BATCH_CONCURRENCY at a time. Every
+    input still gets its own website (a duplicate gets a copy of the first
+    occurrence's content), and all of them are written with a single insert_many.
+    Returns one result per input business, in order.
+    """
+    from app import mongo
+    first_index = {}
+    for index, business in enumerate(businesses):
+        first_index.setdefault(batch_key(business), index)
+
+    generated, errors = {}, {}
+    last_report = time.monotonic()
+    workers = max(1, min(AI_BATCH_CONCURRENCY, len(first_index)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='ai-batch') as pool:
+        futures = {}
+        for key, index in first_index.items():
+            business = businesses[index]
+            futures[pool.submit(generate_with_retry, business['business_type'], business['industry'],
+                                business.get('description', ''), use_cache)] = key
+        for completed, future in enumerate(as_completed(futures), 1):
+            key = futures[future]
+            try:
+                generated[key] = future.result()
+            except Exception as e:
+                errors[key] = str(e) or type(e).__name__
+            if time.monotonic() - last_report >= 1.0 or completed == len(futures):
+                last_report = time.monotonic()
+                job_queue.report_progress(mongo, completed=completed, total=len(futures), failed=len(errors))
+
+    documents = {}
+    for index, business in enumerate(businesses):
+        content = generated.get(batch_key(business))
+        if content is None:
+            continue
+        website_data = copy.deepcopy(content)
+        website_data['metadata'] = ai_metadata(business['business_type'], business['industry'],
+                                               business.get('description', ''))
+        document = Website(owner_id, website_data).to_document()
+        document['_id'] = ObjectId()
+        documents[index] = document
+
+    write_errors = {}
+    if documents:
+        indexes = list(documents)
+        try:
+            mongo.db.websites.insert_many([documents[index] for index in indexes], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                index = indexes[error['index']]
+                write_errors[index] = error.get('errmsg', 'Write failed')
+                del documents[index]
+        if documents:
+            website_changed(mongo)
+
+    results = []
+    for index, business in enumerate(businesses):
+        key = batch_key(business)
+        result = {'index': index}
+        if first_index[key] != index:
+            result['duplicate_of'] = first_index[key]
+        if index in documents:
+            result.update(status='ok', website_id=str(documents[index]['_id']))
+        else:
+            result.update(status='error', error=write_errors.get(index) or errors.get(key, 'Failed to generate content'))
+        results.append(result)
+
+    stats = {
+        'total': len(businesses),
+        'generated': len(generated),
+        'created': len(documents),
+        'failed': len(businesses) - len(documents)
+    }
+    return {'results': results, 'stats': stats}
 
 
 @ai_bp.route('/generate-website', methods=['POST'])
 @token_required
+@rate_limit_by_user(AI_RATE_LIMIT, scope='ai_generation')
 def generate_website(email, user_id, role_id):
     from app import mongo
     try:
@@ -69,22 +444,18 @@ def generate_website(email, user_id, role_id):
         if not business_type or not industry:
             return jsonify({'msg': 'Business type and industry are required'}), 400
 
-        generated_content = generate_website_content_gemini(business_type, industry, description)
+        use_cache = data.get('cache', True) is not False
+        generated_content = generate_website_content_gemini(business_type, industry, description, use_cache)
         if not generated_content:
             return jsonify({'msg': 'Failed to generate content. Please try again.'}), 500
 
         website_data = json.loads(generated_content)
-        website_data['metadata'] = {
-            'business_type': business_type,
-            'industry': industry,
-            'description': description,
-            'generated_by_ai': True,
-            'ai_model': 'gemini'
-        }
+        website_data['metadata'] = ai_metadata(business_type, industry, description)
         
         
         website = Website(user_id, website_data)
         result = website.save(mongo)
+        website_changed(mongo)
         
         return jsonify({
             'msg': 'Website generated successfully',
@@ -100,8 +471,220 @@ def generate_website(email, user_id, role_id):
         return jsonify({'msg': f'An unexpected error occurred: {str(e)}'}), 500
 
 
+@ai_bp.route('/generate-website/stream', methods=['POST'])
+@token_required
+@rate_limit_by_user(AI_RATE_LIMIT, scope='ai_generation')
+def generate_website_stream(email, user_id, role_id):
+    """Generate a website and push each section to the client over SSE as soon as it is parsed.
+
+    Events: `section` ({name, content}) per finished section, then `done`
+    ({website_id, content}) once the document is saved, or `error` ({msg}).
+    """
+    from app import mongo
+    if not can_edit_website(user_id, role_id):
+        return jsonify({'msg': 'Insufficient permissions'}), 403
+
+    data = request.get_json() or {}
+    business_type = data.get('business_type', '')
+    industry = data.get('industry', '')
+    description = data.get('description', '')
+    use_cache = data.get('cache', True) is not False
+
+    if not business_type or not industry:
+        return jsonify({'msg': 'Business type and industry are required'}), 400
+
+    if not get_model():
+        return jsonify({'msg': 'Failed to generate content. Please try again.'}), 500
+
+    def generate():
+        cache_key = generation_cache.key(PROMPT_VERSION, business_type, industry, description)
+        cached = generation_cache.get(mongo, cache_key) if use_cache else None
+        if cached:
+            sections = json.loads(cached)
+            for name, value in sections.items():
+                yield sse_event('section', {'name': name, 'content': value})
+        else:
+            parser = SectionStreamParser()
+            streamed = set()
+            try:
+                for text in stream_website_content_gemini(business_type, industry, description):
+                    for name, value in parser.feed(text):
+                        # Sections that fail the schema are held back and repaired below
+                        if name in SECTION_SCHEMA and section_error(name, value) is None:
+                            streamed.add(name)
+                            yield sse_event('section', {'name': name, 'content': value})
+            except Exception as e:
+                print(f"Gemini API Error: {e}", file=sys.stderr)
+                yield sse_event('error', {'msg': 'Failed to generate content. Please try again.'})
+                return
+
+            sections, invalid = validate_sections(parser.sections, parser.errors)
+            if invalid:
+                # Look again over the whole text, e.g. when a stray '{' came before the document
+                salvaged, reasons = parse_website_content(parser.buffer)
+                for name in list(invalid):
+                    if name in salvaged:
+                        sections[name] = salvaged[name]
+                        del invalid[name]
+                    else:
+                        invalid[name] = reasons[name]
+            if invalid:
+                sections = repair_sections(sections, invalid, business_type, industry, description)
+                if sections is None:
+                    yield sse_event('error', {'msg': f"Failed to generate {', '.join(invalid)}. Please try again."})
+                    return
+            for name in SECTION_KEYS:
+                if name not in streamed:
+                    yield sse_event('section', {'name': name, 'content': sections[name]})
+            sections = {name: sections[name] for name in SECTION_KEYS}
+            generation_cache.set(mongo, cache_key, json.dumps(sections))
+
+        website_data = dict(sections)
+        website_data['metadata'] = ai_metadata(business_type, industry, description)
+        result = Website(user_id, website_data).save(mongo)
+        website_changed(mongo)
+        yield sse_event('done', {
+            'msg': 'Website generated successfully',
+            'website_id': str(result.inserted_id),
+            'content': website_data
+        })
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@ai_bp.route('/jobs/generate-website', methods=['POST'])
+@token_required
+@rate_limit_by_user(AI_RATE_LIMIT, scope='ai_generation')
+def enqueue_generate_website(email, user_id, role_id):
+    """Queue a generation job and return immediately with its id."""
+    from app import mongo
+    if not can_edit_website(user_id, role_id):
+        return jsonify({'msg': 'Insufficient permissions'}), 403
+
+    data = request.get_json() or {}
+    business_type = data.get('business_type', '')
+    industry = data.get('industry', '')
+    description = data.get('description', '')
+
+    if not business_type or not industry:
+        return jsonify({'msg': 'Business type and industry are required'}), 400
+
+    job_id = job_queue.submit(mongo, user_id, 'generate_website', {
+        'owner_id': user_id,
+        'business_type': business_type,
+        'industry': industry,
+        'description': description,
+        'use_cache': data.get('cache', True) is not False
+    }, run_generation_job)
+
+    return jsonify({
+        'msg': 'Generation job queued',
+        'job_id': job_id,
+        'status_url': f'/ai/jobs/{job_id}'
+    }), 202
+
+
+@ai_bp.route('/jobs/generate-websites', methods=['POST'])
+@token_required
+def enqueue_batch_generate_websites(email, user_id, role_id):
+    """Queue generation of many websites at once (e.g. onboarding an agency's clients)."""
+    from app import mongo
+    permissions = current_permissions(user_id, role_id)
+    if not can_edit_website(user_id, role_id):
+        return jsonify({'msg': 'Insufficient permissions'}), 403
+
+    data = request.get_json() or {}
+    businesses = data.get('businesses')
+    if not isinstance(businesses, list) or not businesses:
+        return jsonify({'msg': 'businesses must be a non-empty list'}), 400
+    if len(businesses) > MAX_BATCH_GENERATIONS:
+        return jsonify({'msg': f'At most {MAX_BATCH_GENERATIONS} businesses per batch'}), 400
+
+    # Admins may generate on behalf of another account, like bulk creates
+    owner_id = data.get('owner_id') if permissions.is_admin and data.get('owner_id') else user_id
+    if not ObjectId.is_valid(str(owner_id)) or \
+            mongo.db.users.find_one({'_id': ObjectId(owner_id)}, {'_id': 1}) is None:
+        return jsonify({'msg': 'Invalid owner_id'}), 400
+
+    items, invalid = [], []
+    for index, business in enumerate(businesses):
+        if not isinstance(business, dict) or not business.get('business_type') or not business.get('industry'):
+            invalid.append({'index': index, 'error': 'Business type and industry are required'})
+            continue
+        items.append({
+            'business_type': str(business['business_type']),
+            'industry': str(business['industry']),
+            'description': str(business.get('description') or '')
+        })
+    if invalid:
+        return jsonify({'msg': 'Some businesses are invalid', 'errors': invalid}), 400
+
+    # Charged per model call rather than per request, and only once the batch is known to be valid
+    limited = charge_rate_limit(AI_BATCH_RATE_LIMIT, 'ai_batch_generation',
+                                cost=len({batch_key(item) for item in items}))
+    if limited:
+        return limited
+
+    job_id = job_queue.submit(mongo, user_id, 'generate_websites', {
+        'owner_id': str(owner_id),
+        'businesses': items,
+        'use_cache': data.get('cache', True) is not False
+    }, run_batch_generation_job)
+
+    return jsonify({
+        'msg': 'Batch generation job queued',
+        'job_id': job_id,
+        'count': len(items),
+        'status_url': f'/ai/jobs/{job_id}'
+    }), 202
+
+
+@ai_bp.route('/jobs/<job_id>', methods=['GET'])
+@token_required
+def get_job(email, user_id, role_id, job_id):
+    from app import mongo
+    job = job_queue.get(mongo, job_id)
+    if not job:
+        return jsonify({'msg': 'Job not found'}), 404
+
+    if str(job['owner_id']) != user_id and not current_permissions(user_id, role_id).is_admin:
+        return jsonify({'msg': 'Insufficient permissions'}), 403
+
+    response = {
+        'job_id': str(job['_id']),
+        'status': job['status'],
+        'error': job.get('error'),
+        'created_at': job['created_at'].isoformat(),
+        'updated_at': job['updated_at'].isoformat()
+    }
+    if job.get('progress'):
+        response['progress'] = job['progress']
+    result = job.get('result') or {}
+    if 'results' in result:
+        response['results'] = result['results']
+        response['stats'] = result['stats']
+    elif result.get('website_id'):
+        response['website_id'] = result['website_id']
+        website = Website.find_by_id(mongo, result['website_id'])
+        if website:
+            response['content'] = website['data']
+    return jsonify(response)
+
+
+@ai_bp.route('/cache/stats', methods=['GET'])
+@token_required
+def generation_cache_stats(email, user_id, role_id):
+    if not current_permissions(user_id, role_id).is_admin:
+        return jsonify({'msg': 'Admin only'}), 403
+    return jsonify(generation_cache.stats())
+
+
 @ai_bp.route('/regenerate-website/<website_id>', methods=['PUT'])
 @token_required
+@rate_limit_by_user(AI_RATE_LIMIT, scope='ai_generation')
 def regenerate_website(email, user_id, role_id, website_id):
     from app import mongo
     
@@ -120,33 +703,96 @@ def regenerate_website(email, user_id, role_id, website_id):
     if not business_type or not industry:
         return jsonify({'msg': 'Business type and industry are required'}), 400
 
-    generated_content = generate_website_content_gemini(business_type, industry, description)
+    try:
+        expected_version = expected_version_from_request(data)
+    except ValueError as e:
+        return jsonify({'msg': f'Invalid expected version: {e}'}), 400
+    # Fail before spending a model call on an edit that cannot be saved
+    if expected_version is not None and website_to_edit.get('version', 0) != expected_version:
+        return version_conflict_response(VersionConflict(website_to_edit.get('version', 0)))
+
+    sections = data.get('sections')
+    if sections is not None:
+        if not isinstance(sections, list) or not sections or \
+                any(section not in SECTION_KEYS for section in sections):
+            return jsonify({'msg': f"sections must be a non-empty list of: {', '.join(SECTION_KEYS)}"}), 400
+        return regenerate_sections(mongo, website_to_edit, list(dict.fromkeys(sections)),
+                                   business_type, industry, description, expected_version, user_id)
+
+    # Regenerating asks for new content, so skip the cache unless explicitly requested
+    use_cache = data.get('cache', False) is True
+    generated_content = generate_website_content_gemini(business_type, industry, description, use_cache)
     if not generated_content:
         return jsonify({'msg': 'Failed to generate content. Please try again.'}), 500
         
     try:
         website_data = json.loads(generated_content)
-        website_data['metadata'] = {
-            'business_type': business_type,
-            'industry': industry,
-            'description': description,
-            'generated_by_ai': True,
-            'ai_model': 'gemini'
-        }
-        
-        mongo.db.websites.update_one(
-            {'_id': ObjectId(website_id)},
-            {'$set': {'data': website_data}}
+        website_data['metadata'] = ai_metadata(business_type, industry, description)
+
+        # Write only the leaves that differ rather than replacing all of data
+        version, changes = update_website_versioned(
+            mongo, website_to_edit,
+            lambda current: diff_values(current.get('data') or {}, website_data, 'data'),
+            expected_version, author_id=user_id, source='regenerate'
         )
+        if version is None:
+            return jsonify({'msg': 'Website not found'}), 404
+        if changes:
+            website_changed(mongo, website_id)
         
-        return jsonify({
+        response = jsonify({
             'msg': 'Website re-generated successfully',
             'website_id': website_id,
+            'version': version,
             'content': website_data
-        }), 200
+        })
+        response.set_etag(website_etag(version))
+        return response, 200
 
+    except VersionConflict as e:
+        return version_conflict_response(e)
     except Exception as e:
         return jsonify({'msg': f'Error re-generating website: {str(e)}'}), 500
+
+
+def regenerate_sections(mongo, website, sections, business_type, industry, description,
+                        expected_version=None, user_id=None):
+    """Regenerate only the requested sections concurrently and write the parts that changed."""
+    generated, failed = generate_sections_concurrently(sections, business_type, industry, description)
+    if failed:
+        return jsonify({'msg': f"Failed to generate: {', '.join(failed)}. Please try again."}), 500
+
+    metadata = ai_metadata(business_type, industry, description)
+    replacements = dict(generated, metadata=metadata)
+
+    def compute_changes(current):
+        data = current.get('data') or {}
+        changes = {}
+        for key, value in replacements.items():
+            changes.update(diff_values(data.get(key), value, f'data.{key}'))
+        return changes
+
+    try:
+        version, changes = update_website_versioned(mongo, website, compute_changes, expected_version,
+                                                    author_id=user_id, source='regenerate')
+    except VersionConflict as e:
+        return version_conflict_response(e)
+    if version is None:
+        return jsonify({'msg': 'Website not found'}), 404
+    if changes:
+        website_changed(mongo, website['_id'])
+
+    website_data = dict(website.get('data') or {})
+    website_data.update(replacements)
+    response = jsonify({
+        'msg': 'Website re-generated successfully',
+        'website_id': str(website['_id']),
+        'version': version,
+        'regenerated_sections': sections,
+        'content': website_data
+    })
+    response.set_etag(website_etag(version))
+    return response, 200
     
 
 
@@ -155,7 +801,11 @@ def regenerate_website(email, user_id, role_id, website_id):
 def update_website(email, user_id, role_id, website_id):
     from app import mongo
     try:
-        if not can_edit_website(user_id,role_id):
+        website = Website.find_by_id(mongo, website_id)
+        if not website:
+            return jsonify({'msg': 'Website not found'}), 404
+
+        if not can_edit_website(user_id, role_id, website.get('owner_id')):
             return jsonify({'msg': 'Insufficient permmision'}),403
     
         if not request.is_json:
@@ -168,21 +818,30 @@ def update_website(email, user_id, role_id, website_id):
         allowed_fields = ['business_type', 'industry', 'description', 'content', 'metadata']
         update_fields = {key: data[key] for key in allowed_fields if key in data}
 
-        print(update_fields)
-
         if not update_fields:
             return jsonify({'msg':'no valid fields'})
-    
-        result = mongo.db.websites.update_one(
-            {"_id":ObjectId(website_id)},
-            {"$set":update_fields}
+
+        version, changes = update_website_versioned(
+            mongo, website, lambda current: diff_paths(current, update_fields),
+            expected_version_from_request(data), author_id=user_id, source='update'
         )
+        if version is None:
+            return jsonify({'msg': 'Website not found'}), 404
+        if changes:
+            website_changed(mongo, website_id)
 
-        return jsonify({
+        response = jsonify({
         'msg':'website updated succesfully',
-        'updated_fields':list(update_fields.keys())
-    }),200
-     
+        'updated_fields':list(update_fields.keys()),
+        'version': version
+    })
+        response.set_etag(website_etag(version))
+        return response, 200
+
+    except VersionConflict as e:
+        return version_conflict_response(e)
+    except ValueError as e:
+        return jsonify({'msg': f'Invalid expected version: {e}'}), 400
     except Exception as e:
        print("error:{e}",file=sys.stderr)
        return jsonify({'msg':'error: {str(e)}'}) , 500
@@ -1,11 +1,17 @@
-from flask import Flask, render_template, jsonify
+from flask import Flask, render_template, jsonify, abort
 from flask_pymongo import PyMongo
 from flask_cors import CORS
 import os
 from dotenv import load_dotenv
-from middleware import init_middleware, security_headers
+from middleware import init_middleware, security_headers, limiter
+from metrics import metrics_bp, mongo_listener
+from indexes import init_indexes
+from invalidation import init_invalidation
+from jobs import job_queue
+from page_cache import page_cache, website_page_response
+from generation_cache import generation_cache
 from flask import send_from_directory
-from auth import token_required
+from auth import token_required, principal_cache, current_permissions
 from flask import session, redirect, url_for
 from bson.objectid import ObjectId
 
@@ -18,11 +24,56 @@ CORS(app)
 
 # Configurations
 app.config['MONGO_URI'] = os.getenv('MONGO_URI', 'mongodb://localhost:27017/website_builder')
-mongo = PyMongo(app)
+# The listener feeds per-command counts and latency into /metrics
+mongo = PyMongo(app, event_listeners=[mongo_listener])
+
+# Principal cache (skips the users/roles lookups in token_required on repeat requests)
+app.config['PRINCIPAL_CACHE_ENABLED'] = os.getenv('PRINCIPAL_CACHE_ENABLED', 'true').lower() == 'true'
+principal_cache.configure(
+    maxsize=int(os.getenv('PRINCIPAL_CACHE_SIZE', 1024)),
+    ttl=int(os.getenv('PRINCIPAL_CACHE_TTL', 60))
+)
+
+# Background AI generation workers (per gunicorn worker process)
+job_queue.configure(max_workers=int(os.getenv('AI_WORKERS', 4)))
+
+# Rendered website pages (preview and public pages)
+page_cache.configure(maxsize=int(os.getenv('PAGE_CACHE_SIZE', 256)))
+
+# Content-addressed cache of AI generation results
+generation_cache.configure(
+    maxsize=int(os.getenv('AI_CACHE_SIZE', 1000)),
+    enabled=os.getenv('AI_CACHE_ENABLED', 'true').lower() == 'true'
+)
+
+# Shared cache/rate-limit backend across gunicorn workers (e.g. redis://localhost:6379/0)
+app.config['REDIS_URL'] = os.getenv('REDIS_URL')
+
+app.config['RESPONSE_CACHE_ENABLED'] = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+
+# Optional bearer token required to scrape /metrics
+app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+
+# Opt-in stack-sampling profiler for sampled and slow requests
+app.config['PROFILER_ENABLED'] = os.getenv('PROFILER_ENABLED', 'false').lower() == 'true'
+app.config['PROFILER_SAMPLE_RATE'] = float(os.getenv('PROFILER_SAMPLE_RATE', 0.01))
+app.config['PROFILER_SLOW_MS'] = int(os.getenv('PROFILER_SLOW_MS', 1000))
+app.config['PROFILER_INTERVAL_MS'] = int(os.getenv('PROFILER_INTERVAL_MS', 5))
+app.config['PROFILE_DIR'] = os.getenv('PROFILE_DIR', os.path.join(app.root_path, 'profiles'))
+app.config['PROFILE_MAX_FILES'] = int(os.getenv('PROFILE_MAX_FILES', 200))
+app.config['PROFILE_MAX_BYTES'] = int(os.getenv('PROFILE_MAX_BYTES', 50 * 1024 * 1024))
 
 # Initialize middleware
 init_middleware(app)
 
+# Index CLI commands (and optional startup index build)
+init_indexes(app, mongo)
+
+# Evict this worker's caches when other workers write (auto | change_stream | poll | off)
+app.config['CACHE_INVALIDATION'] = os.getenv('CACHE_INVALIDATION', 'auto')
+app.config['CACHE_INVALIDATION_POLL_INTERVAL'] = float(os.getenv('CACHE_INVALIDATION_POLL_INTERVAL', 2))
+init_invalidation(app)
+
 
 @app.after_request
 def add_security_headers(response):
@@ -35,6 +86,7 @@ from website import website_bp
 from ai_generator import ai_bp
 from preview import preview_bp
 from docs import docs_bp
+from publish import publish_bp
 
 
 
@@ -44,6 +96,11 @@ app.register_blueprint(website_bp)
 app.register_blueprint(ai_bp, url_prefix='/ai')
 app.register_blueprint(preview_bp)
 app.register_blueprint(docs_bp)
+app.register_blueprint(publish_bp)
+app.register_blueprint(metrics_bp)
+
+# Scrapers poll every few seconds; keep them out of the per-IP default limits
+limiter.exempt(metrics_bp)
 
 
 # Health check endpoint
@@ -89,10 +146,12 @@ def admin_page():
 
 @app.route('/website_template/<website_id>')
 def website_template_page(website_id):
+    if not ObjectId.is_valid(website_id):
+        abort(404)
     website = mongo.db.websites.find_one({'_id': ObjectId(website_id)})
     if not website:
         abort(404)
-    return render_template('website_template.html', website_data=website)
+    return website_page_response(website, 'public, no-cache')
 
 
 @app.route('/websites/<website_id>/edit-ai')
@@ -104,8 +163,7 @@ def website_edit_ai_page(email, user_id, role_id, website_id):
 @app.route('/api/dashboard')
 @token_required
 def dashboard_api(email,user_id, role_id):
-    role_doc = mongo.db.roles.find_one({'_id': ObjectId(role_id)})
-    role_name = role_doc['name'] if role_doc else 'Unknown'
+    role_name = current_permissions(user_id, role_id).role_name or 'Unknown'
 
     return jsonify({
         'user': {
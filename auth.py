@@ -1,13 +1,159 @@
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify, current_app, g
 from models import User, Role
 from bson import ObjectId
 import jwt
 import datetime
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
+from metrics import record_cache
 
 auth_bp = Blueprint('auth', __name__)
 
 
+class PrincipalCache:
+    """Bounded, TTL-evicting cache of resolved principals keyed on (user_id, role_id)."""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, maxsize=None, ttl=None):
+        with self._lock:
+            if maxsize is not None:
+                self.maxsize = maxsize
+            if ttl is not None:
+                self.ttl = ttl
+            self._entries.clear()
+
+    def get(self, user_id, role_id):
+        key = (str(user_id), str(role_id))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, principal = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return dict(principal)
+
+    def set(self, user_id, role_id, principal):
+        if self.maxsize <= 0:
+            return
+        key = (str(user_id), str(role_id))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, dict(principal))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id=None, role_id=None):
+        """Drop every entry matching user_id and/or role_id (both None clears the cache)."""
+        with self._lock:
+            if user_id is None and role_id is None:
+                self._entries.clear()
+                return
+            for key, (_, principal) in list(self._entries.items()):
+                if (user_id is not None and key[0] == str(user_id)) or \
+                        (role_id is not None and str(role_id) in (key[1], principal['role_id'])):
+                    del self._entries[key]
+
+    def clear(self):
+        self.invalidate()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+principal_cache = PrincipalCache()
+
+
+def invalidate_principal(user_id=None, role_id=None):
+    """Hook for write paths that change a user's role or a role's definition."""
+    principal_cache.invalidate(user_id=user_id, role_id=role_id)
+
+
+def load_principal(mongo, user_id, role_id):
+    """Resolve the user and role behind a token, using the principal cache when enabled."""
+    use_cache = current_app.config.get('PRINCIPAL_CACHE_ENABLED', True)
+    if use_cache:
+        principal = principal_cache.get(user_id, role_id)
+        record_cache('principal', principal is not None)
+        if principal is not None:
+            return principal
+
+    user = mongo.db.users.find_one({'_id': ObjectId(user_id)})
+    if not user:
+        return None
+
+    # Permissions follow the role currently stored on the user, not the one in the token
+    role = mongo.db.roles.find_one({'_id': ObjectId(user['role_id'])})
+    principal = {
+        'email': user['email'],
+        '_id': str(user['_id']),
+        'role_id': str(user['role_id']),
+        'role': role['name'] if role else None,
+        'permissions': list(role.get('permissions', [])) if role else []
+    }
+
+    if use_cache:
+        principal_cache.set(user_id, role_id, principal)
+    return principal
+
+
+class PermissionContext:
+    """Role and permissions of the current request, resolved once by token_required."""
+
+    def __init__(self, user_id, role_id, role_name=None, permissions=None):
+        self.user_id = str(user_id)
+        self.role_id = str(role_id)
+        self.role_name = role_name
+        self.permissions = permissions or []
+
+    @classmethod
+    def from_principal(cls, principal):
+        return cls(principal['_id'], principal['role_id'], principal['role'], principal['permissions'])
+
+    @property
+    def is_admin(self):
+        return self.role_name == 'Admin'
+
+    def can_access(self, website_owner_id=None):
+        if self.role_name in ('Admin', 'Viewer'):
+            return True
+        elif self.role_name == 'Editor':
+            return str(website_owner_id) == self.user_id
+        return False
+
+    def can_edit(self, website_owner_id=None):
+        if self.role_name == 'Admin':
+            return True
+        elif self.role_name == 'Editor':
+            if website_owner_id is None:
+                return True
+            return str(website_owner_id) == self.user_id
+        return False
+
+
+def current_permissions(user_id=None, role_id=None):
+    """Return the request's PermissionContext, loading the role only outside token_required."""
+    context = g.get('permissions')
+    if context is not None and (user_id is None or str(user_id) == context.user_id) \
+            and (role_id is None or str(role_id) == context.role_id):
+        return context
+
+    from app import mongo
+    role = mongo.db.roles.find_one({'_id': ObjectId(role_id)}) if role_id else None
+    return PermissionContext(user_id, role_id,
+                             role['name'] if role else None,
+                             role.get('permissions', []) if role else [])
+
+
 def generate_token(user_id, role_id):
     payload = {
         'user_id': str(user_id),
@@ -82,18 +228,11 @@ def token_required(f):
             user_id = data['user_id']
             role_id = data['role_id']
 
-            
-            user = mongo.db.users.find_one({'_id': ObjectId(user_id)})
+            user = load_principal(mongo, user_id, role_id)
             if not user:
                 return jsonify({'msg': 'User not found'}), 404
 
-           
-            role = mongo.db.roles.find_one({'_id': ObjectId(role_id)})
-            user['role'] = role['name'] if role else 'Unknown'
-            
-           
-            user['_id'] = str(user['_id'])
-            user['role_id'] = str(user['role_id'])
+            g.permissions = PermissionContext.from_principal(user)
 
         except jwt.ExpiredSignatureError:
             return jsonify({'msg': 'Token has expired!'}), 401
@@ -107,30 +246,7 @@ def token_required(f):
 
 
 def can_access_website(user_id, role_id, website_owner_id=None):
-    from app import mongo
-    role = mongo.db.roles.find_one({'_id': ObjectId(role_id)})
-    if not role:
-        return False
-    
-    if role['name'] == 'Admin':
-        return True
-    elif role['name'] == 'Editor':
-        return str(website_owner_id) == str(user_id)
-    elif role['name'] == 'Viewer':
-        return True
-    return False
+    return current_permissions(user_id, role_id).can_access(website_owner_id)
 
 def can_edit_website(user_id, role_id, website_owner_id=None):
-    from app import mongo
-    role = mongo.db.roles.find_one({'_id': ObjectId(role_id)})
-    if not role:
-        return False
-    
-    if role['name'] == 'Admin':
-        return True
-    elif role['name'] == 'Editor':
-        if website_owner_id is None:
-            return True 
-        else:
-            return str(website_owner_id) == str(user_id) 
-    return False
+    return current_permissions(user_id, role_id).can_edit(website_owner_id)
@@ -0,0 +1,76 @@
+"""Throughput of queued AI generation vs the synchronous endpoint, using the fake model.
+
+A single sync worker handles /ai/generate-website one request at a time, so N
+requests take roughly N x model latency. The job endpoint returns immediately
+and the AI_WORKERS pool overlaps the model calls.
+
+    python benchmarks/bench_ai_jobs.py --jobs 20 --model-latency 0.5 --workers 8
+"""
+import argparse
+import json
+import time
+
+from harness import boot_app, seed, auth_headers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--jobs', type=int, default=20)
+    parser.add_argument('--model-latency', type=float, default=0.5, help='fake model delay in seconds')
+    parser.add_argument('--workers', type=int, default=8, help='job pool size')
+    args = parser.parse_args()
+
+    app_module = boot_app()
+    fixtures = seed(app_module)
+    client = app_module.app.test_client()
+    headers = auth_headers(fixtures['editor_token'])
+
+    import ai_generator
+    from fake_model import FakeGenerativeModel
+    from jobs import job_queue
+    ai_generator.set_model(FakeGenerativeModel(latency=args.model_latency))
+    job_queue.configure(max_workers=args.workers)
+
+    def body(name):
+        # A distinct business per request, so every call misses the generation cache
+        return {'business_type': f'Bakery {name}', 'industry': 'Food', 'description': 'Sourdough'}
+
+    start = time.perf_counter()
+    for i in range(args.jobs):
+        response = client.post('/ai/generate-website', headers=headers, json=body(f'sync {i}'))
+        assert response.status_code == 201, response.get_data(as_text=True)
+    sync_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    job_ids = []
+    for i in range(args.jobs):
+        response = client.post('/ai/jobs/generate-website', headers=headers, json=body(f'queued {i}'))
+        assert response.status_code == 202, response.get_data(as_text=True)
+        job_ids.append(response.get_json()['job_id'])
+    enqueue_seconds = time.perf_counter() - start
+
+    pending = set(job_ids)
+    while pending:
+        for job_id in list(pending):
+            status = client.get(f'/ai/jobs/{job_id}', headers=headers).get_json()['status']
+            if status in ('done', 'failed'):
+                assert status == 'done', job_id
+                pending.discard(job_id)
+        time.sleep(0.01)
+    queued_seconds = time.perf_counter() - start
+
+    print(json.dumps({
+        'jobs': args.jobs,
+        'model_latency_s': args.model_latency,
+        'workers': args.workers,
+        'sync': {'seconds': round(sync_seconds, 3), 'jobs_per_s': round(args.jobs / sync_seconds, 2)},
+        'queued': {
+            'seconds': round(queued_seconds, 3),
+            'jobs_per_s': round(args.jobs / queued_seconds, 2),
+            'enqueue_ms_per_request': round(enqueue_seconds / args.jobs * 1000, 3)
+        }
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+"""p50/p99 latency of /api/dashboard with the principal cache on and off.
+
+    python benchmarks/bench_principal_cache.py --latency-ms 1 --iterations 500
+"""
+import argparse
+import json
+
+from harness import boot_app, seed, auth_headers, measure
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency-ms', type=float, default=1.0, help='simulated Mongo round-trip latency')
+    parser.add_argument('--iterations', type=int, default=300)
+    args = parser.parse_args()
+
+    app_module = boot_app(latency_ms=args.latency_ms)
+    fixtures = seed(app_module)
+    client = app_module.app.test_client()
+    headers = auth_headers(fixtures['editor_token'])
+
+    from auth import principal_cache
+
+    def hit():
+        response = client.get('/api/dashboard', headers=headers)
+        assert response.status_code == 200, response.get_data(as_text=True)
+
+    results = {}
+    for enabled in (False, True):
+        app_module.app.config['PRINCIPAL_CACHE_ENABLED'] = enabled
+        principal_cache.clear()
+        results['cache_on' if enabled else 'cache_off'] = measure(hit, iterations=args.iterations)
+
+    print(json.dumps({'latency_ms': args.latency_ms, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Per-worker vs shared cache and counter backends.
+
+Simulates --workers gunicorn workers receiving requests round-robin, in the two
+deployments the app supports: without REDIS_URL each worker keeps its own
+in-process SimpleCache; with REDIS_URL every worker shares one Redis-protocol
+store (fakeredis here by default, or --redis-url for a real redis-server).
+
+Reports, for each deployment, the hit ratio of a Zipf-like page workload and how
+many of a user's requests get through a counter of --limit kept in that backend.
+Per-worker counters let a user through roughly --workers times the limit; the
+app's own limiter (rate_limiter.SlidingWindowLimiter) is not exercised here.
+
+    python benchmarks/bench_shared_backend.py --workers 4 --requests 20000
+"""
+import argparse
+import json
+import random
+
+from cachelib import SimpleCache, RedisCache
+
+
+def make_backends(workers, shared, redis_url):
+    if not shared:
+        return [SimpleCache(threshold=100000) for _ in range(workers)]
+    if redis_url:
+        import redis
+        client = redis.from_url(redis_url)
+    else:
+        import fakeredis
+        client = fakeredis.FakeRedis()
+    client.flushdb()
+    store = RedisCache(host=client, key_prefix='bench:')
+    return [store] * workers
+
+
+def cache_hit_ratio(backends, requests, keys, seed):
+    rng = random.Random(seed)
+    hits = 0
+    for i in range(requests):
+        backend = backends[i % len(backends)]
+        # Zipf-like popularity: a few websites get most of the reads
+        key = f'page:{int(rng.paretovariate(1.2)) % keys}'
+        if backend.get(key) is not None:
+            hits += 1
+        else:
+            backend.set(key, 'rendered', timeout=300)
+    return hits / requests
+
+
+def allowed_under_limit(backends, attempts, limit):
+    """A per-user get-then-set counter kept in each worker's backend, hit round-robin."""
+    allowed = 0
+    for i in range(attempts):
+        backend = backends[i % len(backends)]
+        current = backend.get('rate:user') or 0
+        if current < limit:
+            backend.set('rate:user', current + 1, timeout=3600)
+            allowed += 1
+    return allowed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--keys', type=int, default=2000)
+    parser.add_argument('--limit', type=int, default=50)
+    parser.add_argument('--redis-url', default=None)
+    args = parser.parse_args()
+
+    results = {}
+    for mode, shared in (('per_worker', False), ('shared', True)):
+        results[mode] = {
+            'cache_hit_ratio': round(cache_hit_ratio(make_backends(args.workers, shared, args.redis_url),
+                                                     args.requests, args.keys, seed=1), 4),
+            'allowed_of_limit': allowed_under_limit(make_backends(args.workers, shared, args.redis_url),
+                                                    args.limit * args.workers * 2, args.limit)
+        }
+
+    print(json.dumps({
+        'workers': args.workers,
+        'requests': args.requests,
+        'keys': args.keys,
+        'limit': args.limit,
+        'backend': args.redis_url or 'fakeredis',
+        'results': results
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
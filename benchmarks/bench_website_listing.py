@@ -0,0 +1,45 @@
+"""Latency of GET /websites as the number of websites grows.
+
+Seeds up to --max-sites websites (default 10k) spread over --owners editors and
+times the Admin listing at each size.
+
+    python benchmarks/bench_website_listing.py --latency-ms 0.5 --max-sites 10000
+"""
+import argparse
+import json
+
+from harness import boot_app, seed, auth_headers, measure
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency-ms', type=float, default=0.5, help='simulated Mongo round-trip latency')
+    parser.add_argument('--max-sites', type=int, default=10000)
+    parser.add_argument('--owners', type=int, default=50)
+    parser.add_argument('--iterations', type=int, default=5)
+    args = parser.parse_args()
+
+    sizes = [n for n in (100, 1000, 5000, 10000, 50000) if n < args.max_sites] + [args.max_sites]
+    results = []
+    for size in sizes:
+        app_module = boot_app(latency_ms=args.latency_ms)
+        fixtures = seed(app_module, n_users=args.owners, n_websites=size)
+        # Measure the query path, not the response cache
+        app_module.app.config['RESPONSE_CACHE_ENABLED'] = False
+        client = app_module.app.test_client()
+        headers = auth_headers(fixtures['admin_token'])
+
+        def hit():
+            response = client.get('/websites', headers=headers)
+            assert response.status_code == 200, response.get_data(as_text=True)
+
+        stats = measure(hit, iterations=args.iterations, warmup=1)
+        stats['sites'] = size
+        results.append(stats)
+        print(json.dumps(stats))
+
+    print(json.dumps({'latency_ms': args.latency_ms, 'owners': args.owners, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
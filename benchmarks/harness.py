@@ -0,0 +1,193 @@
+"""Shared setup for the benchmark scripts.
+
+Boots the Flask app against an in-process mongomock database (optionally with a
+simulated per-call round-trip latency) or a real mongod, and seeds roles, users
+and websites. Requires `mongomock` (see requirements-bench.txt).
+"""
+import logging
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import mongomock
+from werkzeug.security import generate_password_hash
+
+# Collection methods that cost a network round-trip against a real mongod
+ROUND_TRIP_METHODS = {
+    'find_one', 'insert_one', 'insert_many', 'update_one', 'update_many',
+    'delete_one', 'delete_many', 'count_documents', 'aggregate', 'bulk_write',
+    'find_one_and_update'
+}
+
+
+class SlowCollection:
+    """Proxy that sleeps before each round-trip call to mimic network latency."""
+
+    def __init__(self, collection, latency):
+        self._collection = collection
+        self._latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in ROUND_TRIP_METHODS and callable(attr) and self._latency:
+            def call(*args, **kwargs):
+                time.sleep(self._latency)
+                return attr(*args, **kwargs)
+            return call
+        if name == 'find' and self._latency:
+            def find(*args, **kwargs):
+                time.sleep(self._latency)
+                return attr(*args, **kwargs)
+            return find
+        return attr
+
+
+class SlowDatabase:
+    def __init__(self, db, latency):
+        self._db = db
+        self._latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self._db, name)
+        if isinstance(attr, mongomock.Collection):
+            return SlowCollection(attr, self._latency)
+        return attr
+
+    def __getitem__(self, name):
+        return SlowCollection(self._db[name], self._latency)
+
+
+class FakeMongo:
+    """Stands in for flask_pymongo.PyMongo: only `.db` and `.cx` are used by the app."""
+
+    def __init__(self, latency_ms=0.0):
+        self.cx = mongomock.MongoClient()
+        self.raw_db = self.cx.website_builder
+        self.db = SlowDatabase(self.raw_db, latency_ms / 1000.0)
+
+
+class RealMongo:
+    """A real mongod, using a dedicated database that is dropped on connect."""
+
+    DATABASE = 'website_builder_bench'
+
+    def __init__(self, uri):
+        from pymongo import MongoClient
+        self.cx = MongoClient(uri)
+        self.cx.drop_database(self.DATABASE)
+        self.raw_db = self.db = self.cx[self.DATABASE]
+
+
+def boot_app(latency_ms=0.0, mongo_uri=None):
+    """Import the app, swap in a fake (or benchmark-only real) mongo and disable rate limiting and request logging."""
+    logging.disable(logging.INFO)
+    # One process: there are no other workers whose writes need to be picked up
+    os.environ.setdefault('CACHE_INVALIDATION', 'off')
+    import app as app_module
+    from middleware import limiter
+
+    if mongo_uri:
+        from indexes import ensure_indexes
+        app_module.mongo = RealMongo(mongo_uri)
+        ensure_indexes(app_module.mongo)
+    else:
+        app_module.mongo = FakeMongo(latency_ms)
+    app_module.app.config['TESTING'] = True
+    limiter.enabled = False
+    return app_module
+
+
+def seed(app_module, n_users=1, n_websites=0):
+    """Seed the three standard roles, one admin, n editors and n websites round-robin across them."""
+    db = app_module.mongo.raw_db
+    roles = {}
+    for name, permissions in (
+        ('Admin', ['manage_users', 'manage_websites', 'full_access']),
+        ('Editor', ['create_website', 'edit_own_website', 'view_websites']),
+        ('Viewer', ['view_websites'])
+    ):
+        roles[name] = db.roles.insert_one({'name': name, 'permissions': permissions}).inserted_id
+
+    password_hash = generate_password_hash('password123')
+    admin_id = db.users.insert_one({
+        'email': 'admin@example.com', 'password_hash': password_hash, 'role_id': roles['Admin']
+    }).inserted_id
+    editor_ids = db.users.insert_many([
+        {'email': f'editor{i}@example.com', 'password_hash': password_hash, 'role_id': roles['Editor']}
+        for i in range(max(n_users, 1))
+    ]).inserted_ids
+
+    website_ids = []
+    if n_websites:
+        website_ids = db.websites.insert_many([
+            {'owner_id': editor_ids[i % len(editor_ids)], 'data': sample_website_data(i)}
+            for i in range(n_websites)
+        ]).inserted_ids
+
+    with app_module.app.app_context():
+        from auth import generate_token
+        admin_token = generate_token(admin_id, roles['Admin'])
+        editor_token = generate_token(editor_ids[0], roles['Editor'])
+
+    return {
+        'roles': roles,
+        'admin_id': admin_id,
+        'editor_ids': editor_ids,
+        'website_ids': website_ids,
+        'admin_token': admin_token,
+        'editor_token': editor_token
+    }
+
+
+def sample_website_data(i=0):
+    return {
+        'hero_section': {'heading': f'Business {i}', 'subheading': 'Quality service since 1999'},
+        'about_section': {'title': 'About us', 'content': 'We are a family-run business. ' * 8},
+        'services_section': [
+            {'name': f'Service {n}', 'description': 'A service we are proud of. ' * 4}
+            for n in range(4)
+        ],
+        'contact_section': {'title': 'Contact', 'content': 'Call us at 555-0100.'},
+        'metadata': {
+            'business_type': 'Bakery', 'industry': 'Food', 'description': 'Local bakery',
+            'generated_by_ai': True, 'ai_model': 'gemini'
+        }
+    }
+
+
+def auth_headers(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+def measure(fn, iterations=200, warmup=10):
+    """Call fn repeatedly and return latency percentiles in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    elapsed = time.perf_counter() - started
+    samples.sort()
+    return {
+        'iterations': iterations,
+        'throughput_rps': round(iterations / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'mean_ms': round(statistics.fmean(samples), 3)
+    }
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(pct / 100.0 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
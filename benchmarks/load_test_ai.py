@@ -0,0 +1,113 @@
+"""Concurrent /ai/generate-website throughput: sync vs gevent serving, against a stub model.
+
+Starts benchmarks/serve_stub.py in each mode (mongomock + fake model sleeping
+--latency seconds per call), fires --requests requests from --concurrency client
+threads and reports throughput and latency percentiles.
+
+    python benchmarks/load_test_ai.py --requests 50 --concurrency 50 --latency 2-10
+
+To load-test a real deployment instead, pass --url and --token.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from harness import percentile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def start_stub(mode, port, latency):
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(HERE, 'serve_stub.py'), '--mode', mode, '--port', str(port),
+         '--latency', latency],
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, cwd=HERE
+    )
+    for line in process.stdout:
+        if line.startswith('{'):
+            info = json.loads(line)
+            if info.get('ready'):
+                time.sleep(0.5)
+                return process, info['editor_token']
+    raise RuntimeError(f'{mode} stub server failed to start')
+
+
+def run_load(url, token, requests, concurrency):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        while True:
+            with lock:
+                n = next(counter, None)
+            if n is None:
+                return
+            body = json.dumps({'business_type': f'Bakery {n}', 'industry': 'Food'}).encode()
+            req = urllib.request.Request(f'{url}/ai/generate-website', data=body, method='POST', headers={
+                'Authorization': f'Bearer {token}', 'Content-Type': 'application/json'
+            })
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(req, timeout=600) as response:
+                    response.read()
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'completed': len(latencies),
+        'errors': len(errors),
+        'seconds': round(elapsed, 2),
+        'requests_per_s': round(len(latencies) / elapsed, 3),
+        'p50_s': round(percentile(latencies, 50), 2),
+        'p99_s': round(percentile(latencies, 99), 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--latency', default='2-10')
+    parser.add_argument('--modes', default='sync,gevent')
+    parser.add_argument('--url', default=None)
+    parser.add_argument('--token', default=None)
+    args = parser.parse_args()
+
+    results = {}
+    if args.url:
+        results['target'] = run_load(args.url.rstrip('/'), args.token, args.requests, args.concurrency)
+    else:
+        for port, mode in enumerate(args.modes.split(','), start=8101):
+            process, token = start_stub(mode, port, args.latency)
+            try:
+                results[mode] = run_load(f'http://127.0.0.1:{port}', token, args.requests, args.concurrency)
+            finally:
+                process.terminate()
+                process.wait()
+
+    print(json.dumps({'requests': args.requests, 'concurrency': args.concurrency,
+                      'model_latency_s': args.latency, 'results': results}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
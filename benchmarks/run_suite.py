@@ -0,0 +1,161 @@
+"""Benchmark suite for the main API hot paths.
+
+Boots the app against mongomock (or a real mongod with --mongo-uri; the
+`website_builder_bench` database is dropped first) and the fake AI model, seeds
+users, roles and --websites websites, then measures latency percentiles and
+throughput for each scenario. Results are written as JSON so runs from different
+commits can be compared; with --baseline the run fails (exit 1) when a tracked
+metric regresses by more than --threshold.
+
+    python benchmarks/run_suite.py --output bench-main.json
+    python benchmarks/run_suite.py --baseline bench-main.json --threshold 0.25
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+
+from harness import ROOT, boot_app, seed, auth_headers, measure
+
+# Lower is better for latencies, higher is better for throughput
+TRACKED_METRICS = {'p50_ms': 'lower', 'p95_ms': 'lower', 'throughput_rps': 'higher'}
+
+
+def build_scenarios(client, fixtures):
+    """Return {name: callable}; each callable performs one request and checks its status."""
+    admin = auth_headers(fixtures['admin_token'])
+    editor = auth_headers(fixtures['editor_token'])
+    website_ids = itertools.cycle([str(i) for i in fixtures['website_ids']])
+    names = itertools.count()
+
+    def expect(response, status=200):
+        assert response.status_code == status, (response.status_code, response.get_data(as_text=True)[:200])
+
+    def login():
+        expect(client.post('/login', json={'email': 'editor0@example.com', 'password': 'password123'}))
+
+    def dashboard():
+        expect(client.get('/api/dashboard', headers=editor))
+
+    def list_websites():
+        expect(client.get('/websites', headers=admin))
+
+    def list_websites_page():
+        expect(client.get('/websites?fields=summary&limit=50', headers=admin))
+
+    def get_website():
+        expect(client.get(f'/websites/{next(website_ids)}', headers=admin))
+
+    def preview():
+        expect(client.get(f"/preview/{next(website_ids)}?token={fixtures['admin_token']}"))
+
+    def generate():
+        # A fresh business type per call so every request misses the generation cache
+        expect(client.post('/ai/generate-website', headers=editor,
+                           json={'business_type': f'Bakery {next(names)}', 'industry': 'Food'}), 201)
+
+    def regenerate():
+        expect(client.put(f'/ai/regenerate-website/{next(website_ids)}', headers=admin,
+                          json={'business_type': 'Bakery', 'industry': 'Food'}))
+
+    return {
+        'login': login,
+        'dashboard': dashboard,
+        'list_websites': list_websites,
+        'list_websites_page': list_websites_page,
+        'get_website': get_website,
+        'preview': preview,
+        'generate': generate,
+        'regenerate': regenerate
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold):
+    """Return a list of regression messages for metrics tracked in both runs."""
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        for metric, direction in TRACKED_METRICS.items():
+            if metric not in stats or not base.get(metric):
+                continue
+            change = (stats[metric] - base[metric]) / base[metric]
+            if (direction == 'lower' and change > threshold) or (direction == 'higher' and -change > threshold):
+                regressions.append(f"{name}.{metric}: {base[metric]} -> {stats[metric]} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mongo-uri', default=None, help='benchmark a real mongod instead of mongomock')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='simulated Mongo round-trip (mongomock only)')
+    parser.add_argument('--model-latency', type=float, default=0.0, help='fake AI model latency in seconds')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--websites', type=int, default=500)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--ai-iterations', type=int, default=50)
+    parser.add_argument('--scenarios', default=None, help='comma-separated subset to run')
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--baseline', default=None)
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed relative regression')
+    args = parser.parse_args()
+
+    app_module = boot_app(latency_ms=args.latency_ms, mongo_uri=args.mongo_uri)
+    import ai_generator
+    from fake_model import FakeGenerativeModel
+    ai_generator.set_model(FakeGenerativeModel(latency=args.model_latency))
+
+    fixtures = seed(app_module, n_users=args.users, n_websites=args.websites)
+    client = app_module.app.test_client()
+    scenarios = build_scenarios(client, fixtures)
+    selected = args.scenarios.split(',') if args.scenarios else list(scenarios)
+
+    results = {}
+    for name in selected:
+        iterations = args.ai_iterations if name in ('generate', 'regenerate') else args.iterations
+        results[name] = measure(scenarios[name], iterations=iterations, warmup=min(10, iterations))
+        print(f"{name:<20} p50={results[name]['p50_ms']:>8.2f}ms p95={results[name]['p95_ms']:>8.2f}ms "
+              f"{results[name]['throughput_rps']:>9.1f} req/s", file=sys.stderr)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'backend': 'mongod' if args.mongo_uri else 'mongomock',
+            'latency_ms': args.latency_ms,
+            'model_latency': args.model_latency,
+            'users': args.users,
+            'websites': args.websites
+        },
+        'results': results
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        if not os.path.exists(args.baseline):
+            print(f"Baseline {args.baseline} not found", file=sys.stderr)
+            sys.exit(2)
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Serve the app against mongomock and a slow fake model, for load testing.
+
+    python benchmarks/serve_stub.py --mode gevent --port 8001 --latency 2-10
+    python benchmarks/serve_stub.py --mode sync --port 8002 --latency 2-10
+
+'sync' serves one request at a time, like a single gunicorn sync worker.
+'gevent' monkey-patches and serves through gevent's WSGI server, like a gunicorn
+gevent worker. Prints a JSON line with the tokens to use once ready.
+"""
+import argparse
+import sys
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('--mode', choices=('sync', 'threaded', 'gevent'), default='gevent')
+parser.add_argument('--port', type=int, default=8001)
+parser.add_argument('--latency', default='2-10', help='fake model latency in seconds, or a min-max range')
+args = parser.parse_args()
+
+if args.mode == 'gevent':
+    from gevent import monkey
+    monkey.patch_all()
+
+import json  # noqa: E402
+import os  # noqa: E402
+
+os.environ['AI_BACKEND'] = 'fake'
+os.environ['FAKE_AI_LATENCY'] = args.latency
+
+from harness import boot_app, seed  # noqa: E402
+
+
+def main():
+    app_module = boot_app()
+    fixtures = seed(app_module)
+    from generation_cache import generation_cache
+    generation_cache.configure(enabled=False)
+
+    print(json.dumps({'ready': True, 'port': args.port, 'editor_token': fixtures['editor_token']}), flush=True)
+
+    if args.mode == 'gevent':
+        from gevent.pywsgi import WSGIServer
+        WSGIServer(('127.0.0.1', args.port), app_module.app, log=None).serve_forever()
+    else:
+        from werkzeug.serving import make_server
+        make_server('127.0.0.1', args.port, app_module.app, threaded=args.mode == 'threaded').serve_forever()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
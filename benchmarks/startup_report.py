@@ -0,0 +1,89 @@
+"""Cold-start report for `import app` based on `python -X importtime`.
+
+Runs the import in a fresh interpreter several times and reports the median
+total import time, app construction wall time, and the slowest top-level
+imports. Fails (exit 1) if the median exceeds --budget-ms, or regresses more than
+--tolerance over a --baseline report written earlier with --output.
+
+    python benchmarks/startup_report.py --output startup.json
+    python benchmarks/startup_report.py --baseline startup.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def profile_once():
+    code = 'import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)'
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            _, cumulative, indent, name = match.groups()
+            modules[name] = {'cumulative_us': int(cumulative), 'depth': len(indent) // 2}
+    wall_ms = float(result.stdout.strip().splitlines()[-1]) * 1000
+    return wall_ms, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15)
+    parser.add_argument('--budget-ms', type=float, default=None)
+    parser.add_argument('--baseline', default=None)
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    walls = []
+    runs = []
+    for _ in range(args.runs):
+        wall_ms, modules = profile_once()
+        walls.append(wall_ms)
+        runs.append(modules)
+
+    last = runs[-1]
+    app_us = [run['app']['cumulative_us'] for run in runs if 'app' in run]
+    # Direct children of `import app`, i.e. what app.py itself pulls in
+    direct = sorted(((name, info['cumulative_us']) for name, info in last.items() if info['depth'] == 1),
+                    key=lambda item: item[1], reverse=True)
+    report = {
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'import_app_ms': round(statistics.median(app_us) / 1000, 1),
+        'wall_ms': round(statistics.median(walls), 1),
+        'top_imports_ms': {name: round(us / 1000, 1) for name, us in direct[:args.top]},
+        'ai_sdk_loaded_at_startup': 'google.generativeai' in last
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    if args.budget_ms is not None and report['import_app_ms'] > args.budget_ms:
+        failures.append(f"import app took {report['import_app_ms']} ms (budget {args.budget_ms} ms)")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        limit = baseline['import_app_ms'] * (1 + args.tolerance)
+        if report['import_app_ms'] > limit:
+            failures.append(f"import app took {report['import_app_ms']} ms, "
+                            f"more than {args.tolerance:.0%} over baseline {baseline['import_app_ms']} ms")
+    for failure in failures:
+        print(f'REGRESSION: {failure}', file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Concurrent stress test for the sliding-window rate limiter.
+
+Hammers one key from --threads threads and checks that exactly --limit hits are
+admitted, for the in-process store and the shared Redis store (fakeredis, or
+--redis-url). The old get-then-set counter is run alongside for comparison.
+
+    python benchmarks/stress_rate_limiter.py --threads 32 --attempts 200 --limit 500
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+
+from harness import ROOT  # noqa: F401  (puts the app on sys.path)
+from cachelib import SimpleCache
+
+from rate_limiter import SlidingWindowLimiter
+
+
+def hammer(threads, attempts, hit):
+    admitted = [0] * threads
+    barrier = threading.Barrier(threads)
+
+    def worker(n):
+        barrier.wait()
+        for _ in range(attempts):
+            if hit():
+                admitted[n] += 1
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return sum(admitted), time.perf_counter() - start
+
+
+def legacy_counter(limit):
+    cache = SimpleCache()
+
+    def hit():
+        current = cache.get('rate_limit:user') or 0
+        time.sleep(0)  # yield between read and write, as a network round-trip would
+        if current >= limit:
+            return False
+        cache.set('rate_limit:user', current + 1, timeout=3600)
+        return True
+    return hit
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--attempts', type=int, default=200, help='hits per thread')
+    parser.add_argument('--limit', type=int, default=500)
+    parser.add_argument('--redis-url', default=None)
+    args = parser.parse_args()
+    limit_string = f'{args.limit} per hour'
+
+    if args.redis_url:
+        import redis
+        client = redis.from_url(args.redis_url)
+    else:
+        import fakeredis
+        client = fakeredis.FakeRedis()
+    client.delete('rl:stress')
+
+    results = {}
+    memory = SlidingWindowLimiter()
+    shared = SlidingWindowLimiter()
+    for name, hit in (
+        ('legacy_get_set', legacy_counter(args.limit)),
+        ('sliding_window_memory', lambda: memory.hit('stress', limit_string).allowed),
+        ('sliding_window_redis', lambda: shared.hit('stress', limit_string, client).allowed),
+    ):
+        admitted, seconds = hammer(args.threads, args.attempts, hit)
+        results[name] = {
+            'admitted': admitted,
+            'exact': admitted == args.limit,
+            'hits_per_s': round(args.threads * args.attempts / seconds)
+        }
+
+    print(json.dumps({'threads': args.threads, 'attempts': args.threads * args.attempts,
+                      'limit': args.limit, 'results': results}, indent=2))
+    if not (results['sliding_window_memory']['exact'] and results['sliding_window_redis']['exact']):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,235 @@
+import datetime
+
+from bson.objectid import ObjectId
+from pymongo import InsertOne, UpdateOne, DeleteOne
+from pymongo.errors import BulkWriteError
+
+from models import Website
+from versioning import diff_paths, history_entry
+
+MAX_BULK_OPERATIONS = 500
+BULK_OPS = ('create', 'update', 'delete')
+
+
+class BulkRequestError(ValueError):
+    """The request as a whole is malformed (as opposed to a single failing item)."""
+
+
+def _failure(index, op, code, error):
+    return {'index': index, 'op': op, 'status': 'error', 'code': code, 'error': error}
+
+
+def _now():
+    # MongoDB stores milliseconds; truncate so the stamp can be compared after the write
+    now = datetime.datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def run_bulk(mongo, permissions, operations, ordered=True):
+    """Validate and apply a list of create/update/delete operations with one bulk_write.
+
+    Referenced websites are loaded with a single $in query and edit permission is
+    decided once per owner. Updates are compare-and-set on the version read here,
+    like single edits. In ordered mode the first failing item stops the rest, which
+    are reported as skipped. Returns (results, stats) where results has one entry per
+    operation, in order.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise BulkRequestError('operations must be a non-empty list')
+    if len(operations) > MAX_BULK_OPERATIONS:
+        raise BulkRequestError(f'At most {MAX_BULK_OPERATIONS} operations per request')
+
+    ids = set()
+    for op in operations:
+        if isinstance(op, dict) and ObjectId.is_valid(op.get('website_id') or ''):
+            ids.add(ObjectId(op['website_id']))
+    websites = {w['_id']: w for w in mongo.db.websites.find({'_id': {'$in': list(ids)}})} if ids else {}
+
+    # Admins may create on behalf of others; look up every named owner with one $in query
+    owner_ids = set()
+    if permissions.is_admin:
+        for op in operations:
+            if isinstance(op, dict) and op.get('op') == 'create' and ObjectId.is_valid(str(op.get('owner_id') or '')):
+                owner_ids.add(ObjectId(op['owner_id']))
+    known_owners = {str(u['_id']) for u in mongo.db.users.find({'_id': {'$in': list(owner_ids)}}, {'_id': 1})} \
+        if owner_ids else set()
+
+    can_edit = {}
+
+    def allowed(owner_id):
+        key = str(owner_id) if owner_id is not None else None
+        if key not in can_edit:
+            can_edit[key] = permissions.can_edit(owner_id)
+        return can_edit[key]
+
+    now = _now()
+    results = [None] * len(operations)
+    requests = []
+    planned = []  # (operation index, op, website or new document, changes)
+    seen = set()
+
+    for index, op in enumerate(operations):
+        result = _plan(index, op, websites, known_owners, seen, allowed, permissions, now, requests, planned)
+        if result is not None:
+            results[index] = result
+            if result['status'] == 'error' and ordered:
+                break
+
+    write_errors = {}
+    executed = len(requests)
+    matched = deleted = 0
+    if requests:
+        try:
+            result = mongo.db.websites.bulk_write(requests, ordered=ordered)
+            matched, deleted = result.matched_count, result.deleted_count
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                write_errors[error['index']] = error.get('errmsg', 'Write failed')
+            matched, deleted = e.details.get('nMatched', 0), e.details.get('nRemoved', 0)
+            if ordered and write_errors:
+                executed = min(write_errors) + 1
+
+    conflicts = _find_conflicts(mongo, planned[:executed], write_errors, matched, deleted, now)
+
+    for position, (index, op, target, changes) in enumerate(planned):
+        if position >= executed:
+            results[index] = {'index': index, 'op': op, 'status': 'skipped'}
+        elif position in write_errors:
+            results[index] = _failure(index, op, 500, write_errors[position])
+        elif target['_id'] in conflicts:
+            results[index] = _failure(index, op, 409, 'Website was modified by someone else')
+        else:
+            results[index] = {'index': index, 'op': op, 'status': 'ok', 'website_id': str(target['_id'])}
+            if op == 'update':
+                results[index]['version'] = target.get('version', 0) + 1
+                results[index]['changed'] = sorted(changes)
+
+    for index in range(len(operations)):
+        if results[index] is None:
+            op = operations[index].get('op') if isinstance(operations[index], dict) else None
+            results[index] = {'index': index, 'op': op, 'status': 'skipped'}
+
+    _record_history(mongo, planned[:executed], results, permissions.user_id, now)
+
+    stats = {status: sum(1 for r in results if r['status'] == status)
+             for status in ('ok', 'unchanged', 'error', 'skipped')}
+    return results, stats
+
+
+def _plan(index, op, websites, known_owners, seen, allowed, permissions, now, requests, planned):
+    """Append the write for one operation, or return its result if it fails or is a no-op."""
+    if not isinstance(op, dict) or op.get('op') not in BULK_OPS:
+        return _failure(index, op.get('op') if isinstance(op, dict) else None, 400,
+                        f"op must be one of: {', '.join(BULK_OPS)}")
+    kind = op['op']
+
+    if kind == 'create':
+        owner_id = op.get('owner_id') if permissions.is_admin and op.get('owner_id') else permissions.user_id
+        if not ObjectId.is_valid(str(owner_id)):
+            return _failure(index, kind, 400, 'Invalid owner_id')
+        if owner_id != permissions.user_id and str(owner_id) not in known_owners:
+            return _failure(index, kind, 400, 'Owner not found')
+        if not allowed(owner_id):
+            return _failure(index, kind, 403, 'Insufficient permissions')
+        if not isinstance(op.get('data', {}), dict):
+            return _failure(index, kind, 400, 'data must be an object')
+        document = Website(owner_id, op.get('data', {})).to_document()
+        document['_id'] = ObjectId()
+        document['updated_at'] = now
+        requests.append(InsertOne(document))
+        planned.append((index, kind, document, None))
+        return None
+
+    website_id = op.get('website_id')
+    if not ObjectId.is_valid(website_id or ''):
+        return _failure(index, kind, 400, 'Invalid website_id')
+    if website_id in seen:
+        return _failure(index, kind, 400, 'A website may appear only once per bulk request')
+    seen.add(website_id)
+
+    website = websites.get(ObjectId(website_id))
+    if website is None:
+        return _failure(index, kind, 404, 'Website not found')
+    if not allowed(website.get('owner_id')):
+        return _failure(index, kind, 403, 'Insufficient permissions')
+
+    version = website.get('version', 0)
+    expected_version = op.get('expected_version')
+    if expected_version is not None:
+        # Same forms as If-Match on single edits, e.g. 3 or "3"
+        try:
+            expected_version = int(expected_version)
+        except (TypeError, ValueError):
+            return _failure(index, kind, 400, 'expected_version must be an integer')
+    if expected_version is not None and expected_version != version:
+        result = _failure(index, kind, 409, 'Website was modified by someone else')
+        result['current_version'] = version
+        return result
+    version_filter = {'_id': website['_id'], 'version': version if version else {'$in': [0, None]}}
+
+    if kind == 'delete':
+        requests.append(DeleteOne(version_filter if expected_version is not None else {'_id': website['_id']}))
+        planned.append((index, kind, website, None))
+        return None
+
+    updates = op.get('data')
+    if not isinstance(updates, dict) or not updates:
+        return _failure(index, kind, 400, 'data must be a non-empty object of fields to set')
+    changes = diff_paths(website, {f'data.{key}': value for key, value in updates.items()})
+    if not changes:
+        return {'index': index, 'op': kind, 'status': 'unchanged', 'website_id': website_id, 'version': version}
+    update = Website.versioned_update({'$set': {path: change['to'] for path, change in changes.items()}})
+    update['$set']['updated_at'] = now
+    requests.append(UpdateOne(version_filter, update))
+    planned.append((index, kind, website, changes))
+    return None
+
+
+def _find_conflicts(mongo, executed, write_errors, matched, deleted, now):
+    """Ids of updates and deletes whose filter matched nothing (a concurrent write won).
+
+    The bulk result says how many updates matched and how many deletes removed a
+    document; when those equal the number sent there were no conflicts. Otherwise
+    each update is attributed from the website as it is now: it applied if the
+    website moved past the version this batch read and no other writer recorded
+    history for the version right after it (this batch's history is written
+    later). At exactly that version, this batch's updated_at stamp must also
+    match. A delete that did not apply left the website in place. These are not
+    write errors, so they do not stop an ordered batch.
+    """
+    updates, deletes = [], []
+    for position, (_, op, target, _) in enumerate(executed):
+        if position not in write_errors:
+            if op == 'update':
+                updates.append(target)
+            elif op == 'delete':
+                deletes.append(target['_id'])
+
+    conflicts = set()
+    if updates and matched < len(updates):
+        current = {doc['_id']: doc for doc in mongo.db.websites.find(
+            {'_id': {'$in': [t['_id'] for t in updates]}}, {'version': 1, 'updated_at': 1})}
+        taken = {entry['website_id'] for entry in mongo.db.website_history.find(
+            {'$or': [{'website_id': t['_id'], 'version': t.get('version', 0) + 1} for t in updates]},
+            {'website_id': 1})}
+        for target in updates:
+            doc = current.get(target['_id'])
+            next_version = target.get('version', 0) + 1
+            applied = (doc is not None and target['_id'] not in taken and
+                       (doc.get('version', 0) > next_version or
+                        (doc.get('version', 0) == next_version and doc.get('updated_at') == now)))
+            if not applied:
+                conflicts.add(target['_id'])
+    if deletes and deleted < len(deletes):
+        conflicts.update(doc['_id'] for doc in mongo.db.websites.find({'_id': {'$in': deletes}}, {'_id': 1}))
+    return conflicts
+
+
+def _record_history(mongo, executed, results, author_id, now):
+    entries = []
+    for index, op, target, changes in executed:
+        if op == 'update' and results[index]['status'] == 'ok':
+            entries.append(history_entry(target['_id'], results[index]['version'], target.get('version', 0),
+                                         author_id, 'bulk', changes, now))
+    if entries:
+        mongo.db.website_history.insert_many(entries)
@@ -75,6 +75,23 @@ def api_docs_json():
                     "request_body": {
                         "role_id": "role_object_id"
                     }
+                },
+                "list_profiles": {
+                    "method": "GET",
+                    "url": "/profiles",
+                    "description": "List captured request profiles, newest first (Admin only, PROFILER_ENABLED)",
+                    "headers": {
+                        "Authorization": "Bearer <jwt_token>"
+                    }
+                },
+                "get_profile": {
+                    "method": "GET",
+                    "url": "/profiles/<name>",
+                    "description": "Download a profile as flamegraph-ready collapsed stacks (Admin only)",
+                    "headers": {
+                        "Authorization": "Bearer <jwt_token>"
+                    },
+                    "response": "text/plain collapsed stacks"
                 }
             },
             "websites": {
@@ -101,12 +118,33 @@ def api_docs_json():
                     "description": "Get all websites (filtered by role)",
                     "headers": {
                         "Authorization": "Bearer <jwt_token>"
+                    },
+                    "query_params": {
+                        "limit": "Page size (max 100); enables cursor pagination",
+                        "after": "next_cursor from the previous page",
+                        "fields": "'full' (default) or 'summary'"
+                    },
+                    "response": {
+                        "websites": "list of websites",
+                        "next_cursor": "website_id or null"
                     }
                 },
+                "export_websites": {
+                    "method": "GET",
+                    "url": "/websites/export",
+                    "description": "Stream all websites (Admin only)",
+                    "headers": {
+                        "Authorization": "Bearer <jwt_token>"
+                    },
+                    "query_params": {
+                        "format": "'ndjson' (default) or 'json'"
+                    },
+                    "response": "Newline-delimited JSON or a JSON array, streamed"
+                },
                 "get_website": {
                     "method": "GET", 
                     "url": "/websites/<website_id>",
-                    "description": "Get specific website",
+                    "description": "Get specific website (ETag carries its version, e.g. \"v3\")",
                     "headers": {
                         "Authorization": "Bearer <jwt_token>"
                     }
@@ -114,14 +152,58 @@ def api_docs_json():
                 "update_website": {
                     "method": "PUT",
                     "url": "/websites/<website_id>",
-                    "description": "Update website (Admin/Owner)",
+                    "description": "Update website (Admin/Owner). With If-Match, returns 409 if the website changed since that version",
                     "headers": {
-                        "Authorization": "Bearer <jwt_token>"
+                        "Authorization": "Bearer <jwt_token>",
+                        "If-Match": "\"v3\" (optional)"
                     },
                     "request_body": {
                         "data": {
                             "title": "Updated Website"
                         }
+                    },
+                    "response": {
+                        "msg": "Website updated successfully",
+                        "version": 4,
+                        "changed": ["data.title"]
+                    }
+                },
+                "bulk_websites": {
+                    "method": "POST",
+                    "url": "/websites/bulk",
+                    "description": "Create, update and delete up to 500 websites in one bulk write; one result per operation",
+                    "headers": {
+                        "Authorization": "Bearer <jwt_token>"
+                    },
+                    "request_body": {
+                        "ordered": True,
+                        "operations": [
+                            {"op": "create", "data": {"hero_section": {"heading": "Welcome"}}},
+                            {"op": "update", "website_id": "website_id", "data": {"hero_section.heading": "New"},
+                             "expected_version": 3},
+                            {"op": "delete", "website_id": "website_id"}
+                        ]
+                    },
+                    "response": {
+                        "ordered": True,
+                        "ok": 2, "unchanged": 0, "error": 1, "skipped": 0,
+                        "results": [{"index": 0, "op": "create", "status": "ok", "website_id": "new_id"},
+                                    {"index": 1, "op": "update", "status": "error", "code": 409,
+                                     "error": "Website was modified by someone else"},
+                                    {"index": 2, "op": "delete", "status": "ok", "website_id": "website_id"}]
+                    }
+                },
+                "website_history": {
+                    "method": "GET",
+                    "url": "/websites/<website_id>/history?limit=20&before=<version>",
+                    "description": "Per-edit diffs, newest first",
+                    "headers": {
+                        "Authorization": "Bearer <jwt_token>"
+                    },
+                    "response": {
+                        "history": [{"version": 4, "base_version": 3, "source": "edit", "author_id": "user_id",
+                                     "changes": [{"path": "data.title", "from": "Old", "to": "Updated Website"}]}],
+                        "next_before": None
                     }
                 },
                 "delete_website": {
@@ -145,7 +227,8 @@ def api_docs_json():
                         "business_type": "Restaurant",
                         "industry": "Food & Beverage",
                         "description": "Italian restaurant",
-                        "model": "gemini"
+                        "model": "gemini",
+                        "cache": True
                     },
                     "response": {
                         "msg": "Website generated successfully",
@@ -153,6 +236,97 @@ def api_docs_json():
                         "content": "generated_content",
                         "ai_model_used": "gemini"
                     }
+                },
+                "regenerate_website": {
+                    "method": "PUT",
+                    "url": "/ai/regenerate-website/<website_id>",
+                    "description": "Re-generate website content; pass sections to regenerate only those, concurrently",
+                    "headers": {
+                        "Authorization": "Bearer <jwt_token>"
+                    },
+                    "request_body": {
+                        "business_type": "Restaurant",
+                        "industry": "Food & Beverage",
+                        "description": "Italian restaurant",
+                        "sections": ["services_section"],
+                        "expected_version": 3
+                    },
+                    "response": {
+                        "msg": "Website re-generated successfully",
+                        "website_id": "website_id",
+                        "regenerated_sections": ["services_section"],
+                        "content": "merged_content"
+                    }
+                },
+                "generate_website_stream": {
+                    "method": "POST",
+                    "url": "/ai/generate-website/stream",
+                    "description": "Generate website content, streaming each finished section as Server-Sent Events",
+                    "headers": {
+                        "Authorization": "Bearer <jwt_token>"
+                    },
+                    "request_body": {
+                        "business_type": "Restaurant",
+                        "industry": "Food & Beverage",
+                        "description": "Italian restaurant"
+                    },
+                    "response": "text/event-stream: 'section' events ({name, content}), then 'done' ({website_id, content}) or 'error' ({msg})"
+                },
+                "enqueue_generate_website": {
+                    "method": "POST",
+                    "url": "/ai/jobs/generate-website",
+                    "description": "Queue website generation in the background",
+                    "headers": {
+                        "Authorization": "Bearer <jwt_token>"
+                    },
+                    "request_body": {
+                        "business_type": "Restaurant",
+                        "industry": "Food & Beverage",
+                        "description": "Italian restaurant"
+                    },
+                    "response": {
+                        "msg": "Generation job queued",
+                        "job_id": "job_id",
+                        "status_url": "/ai/jobs/<job_id>"
+                    }
+                },
+                "enqueue_batch_generate_websites": {
+                    "method": "POST",
+                    "url": "/ai/jobs/generate-websites",
+                    "description": "Queue generation of up to 500 websites as one background job. Identical businesses (ignoring case and whitespace) share one model call, but each business gets its own website; duplicates report duplicate_of. Charged one unit per distinct business against AI_BATCH_RATE_LIMIT",
+                    "headers": {
+                        "Authorization": "Bearer <jwt_token>"
+                    },
+                    "request_body": {
+                        "businesses": [
+                            {"business_type": "Restaurant", "industry": "Food & Beverage", "description": "Italian restaurant"},
+                            {"business_type": "Gym", "industry": "Fitness"}
+                        ],
+                        "owner_id": "existing user_id (admins only, optional)"
+                    },
+                    "response": {
+                        "msg": "Batch generation job queued",
+                        "job_id": "job_id",
+                        "count": 2,
+                        "status_url": "/ai/jobs/<job_id>"
+                    }
+                },
+                "get_job": {
+                    "method": "GET",
+                    "url": "/ai/jobs/<job_id>",
+                    "description": "Status of a generation job (queued, running, done, failed)",
+                    "headers": {
+                        "Authorization": "Bearer <jwt_token>"
+                    },
+                    "response": {
+                        "job_id": "job_id",
+                        "status": "done",
+                        "website_id": "generated_website_id",
+                        "content": "generated_content",
+                        "progress": "batch jobs: {completed, total, failed}",
+                        "results": "batch jobs: [{index, status, website_id | error, duplicate_of}]",
+                        "stats": "batch jobs: {total, generated, created, failed}"
+                    }
                 }
             },
             "preview": {
@@ -172,6 +346,34 @@ def api_docs_json():
                     "response": "HTML page"
                 }
             },
+            "publish": {
+                "publish_website": {
+                    "method": "POST",
+                    "url": "/websites/<website_id>/publish",
+                    "description": "Render the website to a static page (Admin/Owner)",
+                    "headers": {
+                        "Authorization": "Bearer <jwt_token>"
+                    },
+                    "response": {
+                        "msg": "Website published",
+                        "url": "/sites/<website_id>/"
+                    }
+                },
+                "unpublish_website": {
+                    "method": "DELETE",
+                    "url": "/websites/<website_id>/publish",
+                    "description": "Remove the static page (Admin/Owner)",
+                    "headers": {
+                        "Authorization": "Bearer <jwt_token>"
+                    }
+                },
+                "published_site": {
+                    "method": "GET",
+                    "url": "/sites/<website_id>/",
+                    "description": "Published static page (public)",
+                    "response": "HTML page"
+                }
+            },
             "health": {
                 "health_check": {
                     "method": "GET",
@@ -181,6 +383,12 @@ def api_docs_json():
                         "status": "healthy",
                         "message": "AI Website Builder API is running"
                     }
+                },
+                "metrics": {
+                    "method": "GET",
+                    "url": "/metrics",
+                    "description": "Prometheus metrics for the serving worker (Bearer METRICS_TOKEN when set)",
+                    "response": "text/plain Prometheus exposition"
                 }
             }
         },
@@ -0,0 +1,80 @@
+import json
+import random
+import re
+import time
+
+
+class FakeUsage:
+    def __init__(self, prompt, text):
+        # Roughly four characters per token, like the Gemini tokenizer on English text
+        self.prompt_token_count = len(prompt) // 4
+        self.candidates_token_count = len(text) // 4
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text, usage_metadata=None):
+        self.text = text
+        self.usage_metadata = usage_metadata
+
+
+class FakeGenerativeModel:
+    """Offline stand-in for genai.GenerativeModel used for tests, benchmarks and load tests.
+
+    Returns well-formed website JSON after a simulated delay of `latency` seconds
+    (or a random delay in `latency_range`), without touching the network.
+    """
+
+    def __init__(self, latency=0.0, latency_range=None):
+        self.latency = latency
+        self.latency_range = latency_range
+        self.calls = 0
+
+    def _sleep(self):
+        if self.latency_range:
+            time.sleep(random.uniform(*self.latency_range))
+        elif self.latency:
+            time.sleep(self.latency)
+
+    def generate_content(self, prompt, stream=False):
+        self.calls += 1
+        content = fake_website_content(prompt)
+        section = re.search(r'Generate only the "(\w+)" part', prompt)
+        text = json.dumps(content[section.group(1)] if section else content)
+        if stream:
+            return self._stream(text, FakeUsage(prompt, text))
+        self._sleep()
+        return FakeResponse(text, FakeUsage(prompt, text))
+
+    def _stream(self, text, usage, chunk_size=40):
+        """Yield the response in chunks, spreading the simulated latency across them."""
+        chunks = [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
+        total = random.uniform(*self.latency_range) if self.latency_range else self.latency
+        delay = total / len(chunks)
+        for i, chunk in enumerate(chunks):
+            if delay:
+                time.sleep(delay)
+            yield FakeResponse(chunk, usage if i == len(chunks) - 1 else None)
+
+
+def fake_website_content(prompt=''):
+    match = re.search(r'for a (.+?) business in the (.+?) industry', prompt)
+    business_type, industry = match.groups() if match else ('Local', 'General')
+    return {
+        'hero_section': {
+            'heading': f'{business_type} you can trust',
+            'subheading': f'Serving the {industry} community'
+        },
+        'about_section': {
+            'title': f'About our {business_type}',
+            'content': f'We are a {business_type.lower()} focused on quality in {industry}.'
+        },
+        'services_section': [
+            {'name': f'{business_type} service {n}', 'description': f'Professional {industry} service.'}
+            for n in range(1, 4)
+        ],
+        'contact_section': {
+            'title': 'Get in touch',
+            'content': 'Email hello@example.com or call 555-0100.'
+        }
+    }
@@ -0,0 +1,87 @@
+import datetime
+import hashlib
+import json
+import threading
+
+from metrics import record_cache
+
+
+def normalize(value):
+    """Case- and whitespace-insensitive form of a prompt input."""
+    return ' '.join(str(value or '').split()).lower()
+
+
+class GenerationCache:
+    """Persistent, size-bounded LRU cache of AI generation results.
+
+    Entries live in the `generation_cache` collection keyed by a SHA-256 of the
+    normalized inputs and the prompt version, so changing the prompt template
+    (and bumping its version) naturally misses old entries. Hit/miss counters are
+    kept per process.
+    """
+
+    def __init__(self, maxsize=1000, enabled=True):
+        self.maxsize = maxsize
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def configure(self, maxsize=None, enabled=None):
+        if maxsize is not None:
+            self.maxsize = maxsize
+        if enabled is not None:
+            self.enabled = enabled
+
+    @staticmethod
+    def key(prompt_version, *inputs):
+        payload = json.dumps([prompt_version] + [normalize(i) for i in inputs])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, mongo, key):
+        if not self.enabled:
+            return None
+        entry = mongo.db.generation_cache.find_one_and_update(
+            {'_id': key},
+            {'$set': {'last_used_at': datetime.datetime.utcnow()}, '$inc': {'hits': 1}}
+        )
+        with self._lock:
+            if entry:
+                self.hits += 1
+            else:
+                self.misses += 1
+        record_cache('ai_generation', entry is not None)
+        return entry['content'] if entry else None
+
+    def set(self, mongo, key, content):
+        if not self.enabled or self.maxsize <= 0:
+            return
+        now = datetime.datetime.utcnow()
+        mongo.db.generation_cache.update_one(
+            {'_id': key},
+            {'$set': {'content': content, 'last_used_at': now},
+             '$setOnInsert': {'created_at': now, 'hits': 0}},
+            upsert=True
+        )
+        self._evict(mongo)
+
+    def _evict(self, mongo):
+        excess = mongo.db.generation_cache.estimated_document_count() - self.maxsize
+        if excess <= 0:
+            return
+        stale = mongo.db.generation_cache.find({}, {'_id': 1}).sort('last_used_at', 1).limit(excess)
+        mongo.db.generation_cache.delete_many({'_id': {'$in': [e['_id'] for e in stale]}})
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0
+            }
+
+
+generation_cache = GenerationCache()
@@ -0,0 +1,28 @@
+import os
+import time
+
+# Serving profiles:
+#   sync (default)  - one request per worker process; AI calls block the worker
+#   gevent          - cooperative greenlets; thousands of requests per worker can wait on
+#                     Gemini and Mongo concurrently (pymongo is gevent-aware once patched)
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+# AI generation can legitimately take tens of seconds
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+accesslog = '-' if os.getenv('GUNICORN_ACCESS_LOG', 'false').lower() == 'true' else None
+
+if worker_class in ('gevent', 'eventlet'):
+    # gRPC does not yield to the event loop; the REST transport goes through patched sockets
+    os.environ.setdefault('GEMINI_TRANSPORT', 'rest')
+
+
+def post_fork(server, worker):
+    worker.boot_started = time.monotonic()
+
+
+def post_worker_init(worker):
+    # Time from fork to app loaded; regressions show up here first
+    elapsed = time.monotonic() - getattr(worker, 'boot_started', time.monotonic())
+    worker.log.info(f"Worker {worker.pid} booted in {elapsed * 1000:.0f} ms")
@@ -0,0 +1,118 @@
+import logging
+import os
+
+import click
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+logger = logging.getLogger(__name__)
+
+# collection -> list of (keys, options)
+INDEXES = {
+    'users': [
+        ([('email', ASCENDING)], {'name': 'email_unique', 'unique': True}),
+        ([('updated_at', ASCENDING)], {'name': 'updated_at'}),
+    ],
+    'roles': [
+        ([('name', ASCENDING)], {'name': 'name_unique', 'unique': True}),
+    ],
+    'websites': [
+        ([('owner_id', ASCENDING), ('_id', ASCENDING)], {'name': 'owner_id_id'}),
+        ([('updated_at', ASCENDING)], {'name': 'updated_at'}),
+    ],
+    'website_history': [
+        ([('website_id', ASCENDING), ('version', DESCENDING)], {'name': 'website_id_version'}),
+    ],
+    # Tombstones read by polling cache invalidation; a day is far beyond any poll interval
+    'deletions': [
+        ([('deleted_at', ASCENDING)], {'name': 'deleted_at_ttl', 'expireAfterSeconds': 86400}),
+    ],
+    'generation_cache': [
+        ([('last_used_at', ASCENDING)], {'name': 'last_used_at'}),
+    ],
+}
+
+# Queries on the request hot path that must be served by an index:
+# (description, collection, filter, sort)
+HOT_QUERIES = [
+    ('User.find_by_email', 'users', {'email': 'probe@example.com'}, None),
+    ('Role.find_by_name', 'roles', {'name': 'Admin'}, None),
+    ('get_websites (Editor)', 'websites', {'owner_id': ObjectId()}, [('_id', ASCENDING)]),
+    ('get_website_history', 'website_history', {'website_id': ObjectId()}, [('version', DESCENDING)]),
+]
+
+
+class QueryPlanError(RuntimeError):
+    """Raised when a hot query's winning plan falls back to a collection scan."""
+
+
+def ensure_indexes(mongo):
+    """Create the indexes the app relies on. Safe to run repeatedly."""
+    created = []
+    for collection, specs in INDEXES.items():
+        for keys, options in specs:
+            created.append(mongo.db[collection].create_index(keys, **options))
+    logger.info(f"Ensured indexes: {', '.join(created)}")
+    return created
+
+
+def _plan_stages(plan):
+    """Yield every stage name found anywhere in an explain() plan tree."""
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+
+def check_query_plans(mongo):
+    """Run explain() on each hot query and raise QueryPlanError if any uses COLLSCAN."""
+    report = {}
+    failures = []
+    for name, collection, query, sort in HOT_QUERIES:
+        cursor = mongo.db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        winning_plan = cursor.explain().get('queryPlanner', {}).get('winningPlan', {})
+        stages = list(_plan_stages(winning_plan))
+        report[name] = stages
+        if 'COLLSCAN' in stages:
+            failures.append(name)
+
+    if failures:
+        raise QueryPlanError(f"Collection scan on hot queries: {', '.join(failures)}")
+    return report
+
+
+def init_indexes(app, mongo):
+    """Register the index CLI commands and optionally build indexes at startup."""
+
+    @app.cli.command('ensure-indexes')
+    def ensure_indexes_command():
+        """Create the MongoDB indexes used by the app."""
+        for name in ensure_indexes(mongo):
+            click.echo(f"ok  {name}")
+
+    @app.cli.command('check-indexes')
+    def check_indexes_command():
+        """Fail if any hot query falls back to a collection scan."""
+        try:
+            report = check_query_plans(mongo)
+        except QueryPlanError as e:
+            raise click.ClickException(str(e))
+        for name, stages in report.items():
+            click.echo(f"ok  {name}: {' > '.join(stages)}")
+
+    if os.getenv('ENSURE_INDEXES_ON_STARTUP', 'false').lower() == 'true':
+        with app.app_context():
+            try:
+                ensure_indexes(mongo)
+                if os.getenv('CHECK_QUERY_PLANS_ON_STARTUP', 'false').lower() == 'true':
+                    check_query_plans(mongo)
+            except QueryPlanError:
+                raise
+            except Exception as e:
+                logger.error(f"Could not ensure indexes: {e}")
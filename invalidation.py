@@ -0,0 +1,210 @@
+import datetime
+import logging
+import os
+import threading
+import time
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+import middleware
+from auth import invalidate_principal
+from metrics import registry, Counter, Histogram
+from page_cache import page_cache
+
+logger = logging.getLogger(__name__)
+
+WATCHED_COLLECTIONS = ('websites', 'users', 'roles')
+# Writers stamp updated_at with their own clock; re-read this far back to absorb skew
+POLL_SKEW = datetime.timedelta(seconds=5)
+# "$changeStream stage is only supported on replica sets"
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+INVALIDATIONS = registry.register(Counter(
+    'cache_invalidations_total', 'Remote cache invalidations applied by this worker', ('collection', 'source')))
+INVALIDATION_LAG = registry.register(Histogram(
+    'cache_invalidation_lag_seconds', 'Delay between a write and its eviction in this worker (stale-read window)',
+    ('source',), buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)))
+
+
+class ChangeStreamUnavailable(Exception):
+    pass
+
+
+def record_deletion(mongo, collection, *document_ids):
+    """Leave tombstones so polling workers can see deletes, which have no updated_at to find."""
+    now = datetime.datetime.utcnow()
+    mongo.db.deletions.insert_many([
+        {'collection': collection, 'document_id': str(document_id), 'deleted_at': now}
+        for document_id in document_ids
+    ])
+
+
+def evict(collection, document_id):
+    """Drop this worker's cached copies of a document written by another process."""
+    document_id = str(document_id)
+    if collection == 'websites':
+        page_cache.invalidate(document_id)
+        # Tag versions already live in the shared store when Redis is configured
+        if middleware.shared_redis is None:
+            middleware.invalidate_tags('websites', f'website:{document_id}')
+    elif collection == 'users':
+        invalidate_principal(user_id=document_id)
+    elif collection == 'roles':
+        invalidate_principal(role_id=document_id)
+
+
+class InvalidationListener:
+    """Per-worker thread that evicts local cache entries when websites, users or roles change.
+
+    Tails a database change stream when the deployment supports it (replica set or
+    sharded cluster) and otherwise polls `updated_at` plus the `deletions` tombstones.
+    """
+
+    def __init__(self):
+        self.mode = None
+        self.poll_interval = 2.0
+        self._pid = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def started(self):
+        # A forked worker inherits the flag but not the thread
+        return self._pid == os.getpid()
+
+    def start(self, app, mongo, mode='auto', poll_interval=2.0):
+        with self._lock:
+            if self.started:
+                return
+            self._pid = os.getpid()
+            self.poll_interval = poll_interval
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(app, mongo, mode),
+                                            name='cache-invalidation', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self, app, mongo, mode):
+        with app.app_context():
+            if mode in ('auto', 'change_stream'):
+                try:
+                    self._watch(mongo)
+                    return
+                except ChangeStreamUnavailable as e:
+                    if mode == 'change_stream':
+                        logger.error(f"Cache invalidation disabled: {e}")
+                        return
+                    logger.info(f"Change streams unavailable ({e}); polling every {self.poll_interval}s")
+            self.mode = 'poll'
+            self._poll(mongo)
+
+    def _apply(self, collection, document_id, written_at, source):
+        evict(collection, document_id)
+        INVALIDATIONS.inc(collection, source)
+        if written_at is not None:
+            lag = (datetime.datetime.utcnow() - written_at).total_seconds()
+            INVALIDATION_LAG.observe(max(lag, 0.0), source)
+
+    def _watch(self, mongo):
+        pipeline = [{'$match': {'ns.coll': {'$in': list(WATCHED_COLLECTIONS)},
+                                'operationType': {'$in': ['insert', 'update', 'replace', 'delete']}}}]
+        watch = getattr(mongo.db, 'watch', None)
+        if not callable(watch):
+            # e.g. mongomock, where attribute access yields a collection instead
+            raise ChangeStreamUnavailable('client does not support change streams')
+        resume_token = None
+        opened = False
+        while not self._stop.is_set():
+            try:
+                with watch(pipeline, resume_after=resume_token, max_await_time_ms=1000) as stream:
+                    # Only report a change stream once the server has actually opened one
+                    opened = True
+                    self.mode = 'change_stream'
+                    while not self._stop.is_set():
+                        change = stream.try_next()
+                        if change is None:
+                            continue
+                        resume_token = stream.resume_token
+                        self._apply(change['ns']['coll'], change['documentKey']['_id'],
+                                    self._event_time(change), 'change_stream')
+            except NotImplementedError as e:
+                raise ChangeStreamUnavailable(str(e) or 'not supported by this client')
+            except OperationFailure as e:
+                if not opened and e.code == CHANGE_STREAMS_UNSUPPORTED:
+                    raise ChangeStreamUnavailable(e.details.get('errmsg', str(e)) if e.details else str(e))
+                logger.error(f"Change stream failed, resuming: {e}")
+                time.sleep(1)
+            except PyMongoError as e:
+                logger.error(f"Change stream interrupted, resuming: {e}")
+                time.sleep(1)
+
+    @staticmethod
+    def _event_time(change):
+        # wallTime needs MongoDB 6.0+; clusterTime is a seconds-resolution Timestamp
+        if change.get('wallTime'):
+            return change['wallTime'].replace(tzinfo=None)
+        if change.get('clusterTime'):
+            return datetime.datetime.utcfromtimestamp(change['clusterTime'].time)
+        return None
+
+    def _poll(self, mongo):
+        collections = WATCHED_COLLECTIONS + ('deletions',)
+        since = {name: datetime.datetime.utcnow() for name in collections}
+        # (document _id, stamp) pairs already applied inside each collection's skew window
+        seen = {name: {} for name in collections}
+        while not self._stop.wait(self.poll_interval):
+            try:
+                for collection in collections:
+                    field = 'deleted_at' if collection == 'deletions' else 'updated_at'
+                    projection = {field: 1, 'collection': 1, 'document_id': 1}
+                    for doc in mongo.db[collection].find({field: {'$gt': since[collection] - POLL_SKEW}},
+                                                         projection):
+                        key = (doc['_id'], doc[field])
+                        if key in seen[collection]:
+                            continue
+                        seen[collection][key] = doc[field]
+                        since[collection] = max(since[collection], doc[field])
+                        if collection == 'deletions':
+                            self._apply(doc['collection'], doc['document_id'], doc[field], 'poll')
+                        else:
+                            self._apply(collection, doc['_id'], doc[field], 'poll')
+                    horizon = since[collection] - POLL_SKEW
+                    seen[collection] = {k: stamp for k, stamp in seen[collection].items() if stamp >= horizon}
+            except PyMongoError as e:
+                logger.error(f"Invalidation poll failed: {e}")
+
+
+invalidation_listener = InvalidationListener()
+
+
+def _listener_state():
+    # mode stays None until a change stream has opened or polling has begun
+    mode = (invalidation_listener.mode or 'starting') if invalidation_listener.running else 'off'
+    return ['# HELP cache_invalidation_listener Active remote invalidation mode in this worker',
+            '# TYPE cache_invalidation_listener gauge',
+            f'cache_invalidation_listener{{mode="{mode}"}} 1']
+
+
+registry.add_collector(_listener_state)
+
+
+def init_invalidation(app):
+    """Start the listener on the first request, after gunicorn has forked the worker."""
+    mode = app.config.get('CACHE_INVALIDATION', 'auto')
+    if mode == 'off':
+        return
+
+    @app.before_request
+    def start_invalidation_listener():
+        if not invalidation_listener.started:
+            from app import mongo
+            invalidation_listener.start(app, mongo, mode, app.config.get('CACHE_INVALIDATION_POLL_INTERVAL', 2.0))
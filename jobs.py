@@ -0,0 +1,98 @@
+import datetime
+import logging
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from bson.objectid import ObjectId
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobQueue:
+    """Background job runner backed by a thread pool.
+
+    Job state lives in the `ai_jobs` collection rather than in process memory so
+    that a status request served by a different gunicorn worker still sees it.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def configure(self, max_workers):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+            self.max_workers = max_workers
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                    thread_name_prefix='ai-job')
+            return self._executor
+
+    def submit(self, mongo, owner_id, kind, payload, fn):
+        """Record a queued job and schedule fn(**payload) on the pool. Returns the job id."""
+        now = datetime.datetime.utcnow()
+        job_id = mongo.db.ai_jobs.insert_one({
+            'owner_id': ObjectId(owner_id),
+            'kind': kind,
+            'status': QUEUED,
+            'request': payload,
+            'result': None,
+            'error': None,
+            'created_at': now,
+            'updated_at': now
+        }).inserted_id
+        self.executor.submit(self._run, current_app._get_current_object(), mongo, job_id, fn, payload)
+        return str(job_id)
+
+    def _run(self, app, mongo, job_id, fn, payload):
+        self._local.job_id = job_id
+        try:
+            self._set_status(mongo, job_id, RUNNING)
+            # Job bodies may use the cache, templates and config like a request would
+            with app.app_context():
+                result = fn(**payload)
+        except Exception as e:
+            print(f"AI job {job_id} failed: {e}", file=sys.stderr)
+            self._set_status(mongo, job_id, FAILED, error=str(e))
+            return
+        finally:
+            self._local.job_id = None
+        self._set_status(mongo, job_id, DONE, result=result)
+
+    def report_progress(self, mongo, **progress):
+        """Record progress for the job running on the calling thread; a no-op outside a job."""
+        job_id = getattr(self._local, 'job_id', None)
+        if job_id is None:
+            return
+        mongo.db.ai_jobs.update_one({'_id': job_id}, {'$set': {
+            'progress': progress, 'updated_at': datetime.datetime.utcnow()
+        }})
+
+    @staticmethod
+    def _set_status(mongo, job_id, status, **fields):
+        fields.update({'status': status, 'updated_at': datetime.datetime.utcnow()})
+        mongo.db.ai_jobs.update_one({'_id': job_id}, {'$set': fields})
+
+    @staticmethod
+    def get(mongo, job_id):
+        if not ObjectId.is_valid(job_id):
+            return None
+        return mongo.db.ai_jobs.find_one({'_id': ObjectId(job_id)})
+
+
+job_queue = JobQueue()
@@ -0,0 +1,134 @@
+import json
+import re
+
+_decoder = json.JSONDecoder()
+_VALUE_START = re.compile(r'[{\[]')
+
+
+def extract_json(text, accept=None):
+    """Return the first JSON object or array embedded in text.
+
+    Preambles, ```json fences and trailing commentary are skipped. Each '{' or '['
+    is tried as a starting point in turn, so a value is found even when the text
+    before it contains stray brackets. accept(value) can reject a candidate (say an
+    inner object decoded because the outer one is malformed) and keep searching.
+    Raises ValueError if no acceptable value is found.
+    """
+    match = _VALUE_START.search(text)
+    while match:
+        try:
+            value, _ = _decoder.raw_decode(text, match.start())
+        except json.JSONDecodeError:
+            pass
+        else:
+            if accept is None or accept(value):
+                return value
+        match = _VALUE_START.search(text, match.start() + 1)
+    raise ValueError('No JSON value found in model output')
+
+
+def extract_members(text, keys):
+    """Decode the value after each `"key":` in text on its own, ignoring the rest.
+
+    A last resort for a malformed document: one broken value (even an unbalanced
+    quote) cannot hide the others. Returns ({key: value}, {key: reason}) with a
+    reason for every key that was not found or did not decode.
+    """
+    values, errors = {}, {}
+    for key in keys:
+        errors[key] = 'missing'
+        for match in re.finditer(r'"%s"\s*:\s*' % re.escape(key), text):
+            try:
+                values[key], _ = _decoder.raw_decode(text, match.end())
+            except json.JSONDecodeError as e:
+                errors[key] = f'{e.msg} in {text[match.end():match.end() + 80]!r}'
+                continue
+            del errors[key]
+            break
+    return values, errors
+
+
+class SectionStreamParser:
+    """Incrementally pull top-level "key": value pairs out of a streamed JSON object.
+
+    Text is fed in arbitrary chunks; every time a top-level value is complete it is
+    decoded and returned from feed(). Anything before the first '{' (preambles,
+    ```json fences) is skipped. Values that fail to decode are recorded in
+    `errors` instead of aborting the stream.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.expecting = 'key'
+        self.token_start = None
+        self.current_key = None
+        self.done = False
+        self.sections = {}
+        self.errors = {}
+
+    def feed(self, text):
+        """Consume more model output; return a list of (key, value) completed by it."""
+        self.buffer += text
+        completed = []
+        while self.pos < len(self.buffer) and not self.done:
+            char = self.buffer[self.pos]
+
+            if self.depth == 0:
+                if char == '{':
+                    self.depth = 1
+                self.pos += 1
+                continue
+
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif char == '\\':
+                    self.escape = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.depth == 1 and self.expecting == 'key_end':
+                        self.current_key = self._decode(self.token_start, self.pos + 1)
+                        self.expecting = 'colon'
+                self.pos += 1
+                continue
+
+            if char == '"':
+                self.in_string = True
+                if self.depth == 1 and self.expecting == 'key':
+                    self.token_start = self.pos
+                    self.expecting = 'key_end'
+            elif char in '{[':
+                self.depth += 1
+            elif char in ']}' and self.depth > 1:
+                self.depth -= 1
+            elif self.depth == 1 and char == ':' and self.expecting == 'colon':
+                self.token_start = self.pos + 1
+                self.expecting = 'value'
+            elif self.depth == 1 and char in ',}':
+                if self.expecting == 'value':
+                    section = self._finish_value()
+                    if section:
+                        completed.append(section)
+                self.expecting = 'key'
+                if char == '}':
+                    self.depth = 0
+                    self.done = True
+            self.pos += 1
+        return completed
+
+    def _decode(self, start, end):
+        return json.loads(self.buffer[start:end])
+
+    def _finish_value(self):
+        raw = self.buffer[self.token_start:self.pos].strip()
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError as e:
+            self.errors[self.current_key] = f'{e.msg} in {raw[:80]!r}'
+            return None
+        self.sections[self.current_key] = value
+        return self.current_key, value
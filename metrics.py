@@ -0,0 +1,255 @@
+import bisect
+import threading
+import time
+
+from flask import Blueprint, Response, current_app, request, jsonify
+from pymongo import monitoring
+
+metrics_bp = Blueprint('metrics', __name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+    def collect(self):
+        values = self.snapshot()
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        for label_values, value in sorted(values.items()):
+            lines.append(f'{self.name}{_format_labels(self.labels, label_values)} {value}')
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket histogram; p50/p95/p99 are estimated from the buckets at scrape time.
+
+    observe() is a bisect and a few additions under a lock, so it is cheap enough
+    to call on every request and every Mongo command.
+    """
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def quantile(self, q, *label_values):
+        with self._lock:
+            series = self._series.get(label_values)
+            counts = list(series[0]) if series else None
+        return self._estimate(q, counts) if counts else None
+
+    def _estimate(self, q, counts):
+        """Linear interpolation within the bucket holding the q-th observation."""
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            if seen + count >= rank and count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def collect(self):
+        with self._lock:
+            snapshot = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        quantile_lines = [f'# HELP {self.name}_quantile Estimated {self.documentation.lower()} quantiles',
+                          f'# TYPE {self.name}_quantile gauge']
+        for label_values, (counts, total, count) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{_format_labels(self.labels, label_values, [("le", le)])} '
+                             f'{cumulative}')
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f'{self.name}_sum{labels} {total}')
+            lines.append(f'{self.name}_count{labels} {count}')
+            for q in QUANTILES:
+                quantile_lines.append(
+                    f'{self.name}_quantile{_format_labels(self.labels, label_values, [("quantile", q)])} '
+                    f'{self._estimate(q, counts)}')
+        return lines + quantile_lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, fn):
+        """fn() returns extra exposition lines, computed at scrape time."""
+        self._collectors.append(fn)
+
+    def exposition(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        for fn in self._collectors:
+            lines.extend(fn())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ('method', 'route', 'status')))
+REQUEST_MONGO_COMMANDS = registry.register(Histogram(
+    'http_request_mongo_commands', 'Mongo commands issued per request', ('route',),
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50, 100)))
+MONGO_COMMANDS = registry.register(Counter(
+    'mongo_commands_total', 'Mongo commands by name and outcome', ('command', 'outcome')))
+MONGO_LATENCY = registry.register(Histogram(
+    'mongo_command_duration_seconds', 'Mongo command latency', ('command',), buckets=MONGO_BUCKETS))
+AI_LATENCY = registry.register(Histogram(
+    'ai_request_duration_seconds', 'AI model call latency', ('operation', 'outcome')))
+AI_TOKENS = registry.register(Counter(
+    'ai_tokens_total', 'AI tokens reported by the model', ('operation', 'kind')))
+AI_RETRIES = registry.register(Counter(
+    'ai_retries_total', 'AI model calls retried after a transient error', ('operation',)))
+AI_REPAIRS = registry.register(Counter(
+    'ai_section_repairs_total', 'Sections re-requested because the model output for them was missing or malformed',
+    ('section',)))
+CACHE_REQUESTS = registry.register(Counter(
+    'cache_requests_total', 'Cache lookups by cache and result', ('cache', 'result')))
+
+
+def record_cache(cache_name, hit):
+    CACHE_REQUESTS.inc(cache_name, 'hit' if hit else 'miss')
+
+
+def _cache_hit_ratios():
+    values = CACHE_REQUESTS.snapshot()
+    lines = ['# HELP cache_hit_ratio Hits over lookups since process start',
+             '# TYPE cache_hit_ratio gauge']
+    for name in sorted({cache_name for cache_name, _ in values}):
+        hits = values.get((name, 'hit'), 0)
+        total = hits + values.get((name, 'miss'), 0)
+        lines.append(f'cache_hit_ratio{_format_labels(("cache",), (name,))} {hits / total if total else 0.0}')
+    return lines
+
+
+registry.add_collector(_cache_hit_ratios)
+
+
+class _RequestStats(threading.local):
+    def __init__(self):
+        self.active = False
+        self.commands = 0
+        self.mongo_seconds = 0.0
+
+
+request_stats = _RequestStats()
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Counts and times every Mongo command, attributing it to the current request.
+
+    Synchronous pymongo publishes events on the thread that issued the command, so
+    a thread-local is enough to tie commands to the request being served.
+    """
+
+    def started(self, event):
+        pass
+
+    def _record(self, event, outcome):
+        seconds = event.duration_micros / 1e6
+        MONGO_COMMANDS.inc(event.command_name, outcome)
+        MONGO_LATENCY.observe(seconds, event.command_name)
+        if request_stats.active:
+            request_stats.commands += 1
+            request_stats.mongo_seconds += seconds
+
+    def succeeded(self, event):
+        self._record(event, 'success')
+
+    def failed(self, event):
+        self._record(event, 'failure')
+
+
+mongo_listener = MongoCommandListener()
+
+
+def begin_request():
+    request_stats.active = True
+    request_stats.commands = 0
+    request_stats.mongo_seconds = 0.0
+    return time.perf_counter()
+
+
+def end_request(started_at, method, route, status):
+    """Record the request and return (duration, mongo commands, mongo seconds)."""
+    duration = time.perf_counter() - started_at
+    request_stats.active = False
+    REQUEST_LATENCY.observe(duration, method, route, str(status))
+    REQUEST_MONGO_COMMANDS.observe(request_stats.commands, route)
+    return duration, request_stats.commands, request_stats.mongo_seconds
+
+
+def record_ai_call(operation, started_at, outcome, response=None):
+    AI_LATENCY.observe(time.perf_counter() - started_at, operation, outcome)
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is not None:
+        AI_TOKENS.inc(operation, 'prompt', amount=getattr(usage, 'prompt_token_count', 0) or 0)
+        AI_TOKENS.inc(operation, 'completion', amount=getattr(usage, 'candidates_token_count', 0) or 0)
+
+
+@metrics_bp.route('/metrics')
+def metrics():
+    """Prometheus text exposition for this worker process."""
+    expected = current_app.config.get('METRICS_TOKEN')
+    if expected and request.headers.get('Authorization') != f'Bearer {expected}':
+        return jsonify({'msg': 'Invalid metrics token'}), 401
+    return Response(registry.exposition(), mimetype='text/plain; version=0.0.4')
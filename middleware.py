@@ -1,10 +1,17 @@
-from flask import request, jsonify, g
+from flask import request, jsonify, g, make_response, current_app
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_caching import Cache
 import time
 import logging
+import hashlib
+import threading
+import uuid
+from urllib.parse import urlencode
 from functools import wraps
+from rate_limiter import sliding_window
+from metrics import begin_request, end_request, record_cache
+from profiler import init_profiler
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -19,21 +26,58 @@ cache = Cache(config={
     'CACHE_DEFAULT_TIMEOUT': 300
 })
 
-def init_middleware(app):
+# Shared Redis-protocol client (None when running with per-process backends)
+shared_redis = None
+
+
+def connect_shared_backend(app, client=None):
+    """Point cache, limiter and rate_limit_by_user at a shared Redis-protocol store.
+
+    Uses `client` if given (e.g. a fakeredis instance), otherwise REDIS_URL. With
+    neither, every gunicorn worker keeps its own in-memory counters and cache.
+    """
+    global shared_redis
+    redis_url = app.config.get('REDIS_URL')
+    if client is None and redis_url:
+        import redis
+        client = redis.from_url(redis_url)
+    shared_redis = client
+
+    if client is None:
+        return {}
+
+    if redis_url:
+        app.config.setdefault('RATELIMIT_STORAGE_URI', redis_url)
+    return {
+        'CACHE_TYPE': 'RedisCache',
+        # cachelib accepts a ready client object in place of a host name
+        'CACHE_REDIS_HOST': client,
+        'CACHE_KEY_PREFIX': app.config.get('CACHE_KEY_PREFIX', 'awb:')
+    }
+
+
+def init_middleware(app, redis_client=None):
     """Initialize all middleware components"""
+    cache_config = connect_shared_backend(app, redis_client)
     limiter.init_app(app)
-    cache.init_app(app)
+    cache.init_app(app, config=cache_config or None)
+    if app.config.get('PROFILER_ENABLED'):
+        init_profiler(app)
     
     @app.before_request
-    def log_request():
-        g.start_time = time.time()
-        logger.info(f"Request: {request.method} {request.path} from {request.remote_addr}")
+    def start_request_timer():
+        g.start_time = begin_request()
     
     @app.after_request
     def log_response(response):
         if hasattr(g, 'start_time'):
-            duration = time.time() - g.start_time
-            logger.info(f"Response: {response.status_code} in {duration:.3f}s")
+            # Route template (not the raw path) keeps metric label cardinality bounded
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            duration, commands, mongo_seconds = end_request(g.start_time, request.method, route,
+                                                            response.status_code)
+            if logger.isEnabledFor(logging.INFO):
+                logger.info("%s %s %s %.1fms mongo=%d/%.1fms", request.method, request.path,
+                            response.status_code, duration * 1000, commands, mongo_seconds * 1000)
         return response
     
     # Error handling middleware
@@ -61,59 +105,225 @@ def init_middleware(app):
         }), 404
 
 
-def rate_limit_by_user(limit_string):
-    """Rate limit decorator that uses user ID from JWT token"""
+def rate_limit_by_user(limit_string, scope=None):
+    """Per-user sliding-window rate limit, e.g. @rate_limit_by_user("10 per hour").
+
+    Place it below @token_required so it can reuse the principal resolved there;
+    unauthenticated requests are limited per remote address. Each decorated route
+    has its own window unless several routes share a `scope`.
+    """
     def decorator(f):
+        route_scope = scope or f.__name__
+
         @wraps(f)
         def wrapped(*args, **kwargs):
-            
-            user_id = None
-            if 'Authorization' in request.headers:
-                try:
-                    import jwt
-                    from flask import current_app
-                    token = request.headers['Authorization'].split(' ')[1]
-                    data = jwt.decode(token, current_app.config.get('SECRET_KEY'), algorithms=['HS256'])
-                    user_id = data.get('user_id')
-                except:
-                    pass
-            
-            
-            key = f"user:{user_id}" if user_id else get_remote_address()
-            
-            
-            cache_key = f"rate_limit:{key}"
-            current_requests = cache.get(cache_key) or 0
-            
-            if current_requests >= 50:  
-                return jsonify({
-                    'error': 'Rate limit exceeded',
-                    'message': 'Too many requests. Please try again later.'
-                }), 429
-            
-            cache.set(cache_key, current_requests + 1, timeout=3600)  # 1 hour
-            return f(*args, **kwargs)
+            if not limiter.enabled:
+                return f(*args, **kwargs)
+
+            result = _charge(limit_string, route_scope)
+            if not result.allowed:
+                response = _rate_limited(result)
+            else:
+                response = make_response(f(*args, **kwargs))
+            response.headers['X-RateLimit-Limit'] = str(result.limit)
+            response.headers['X-RateLimit-Remaining'] = str(result.remaining)
+            return response
         return wrapped
     return decorator
 
 
-def cache_response(timeout=300):
-    """Cache response decorator"""
+def charge_rate_limit(limit_string, scope, cost=1):
+    """Charge `cost` hits against the caller's window from inside a view, for limits
+    that depend on the request body (e.g. the number of items in a batch).
+
+    Returns a 429 response when the hits do not fit (none are recorded then), else None.
+    """
+    if not limiter.enabled:
+        return None
+    result = _charge(limit_string, scope, cost)
+    return None if result.allowed else _rate_limited(result)
+
+
+def _charge(limit_string, scope, cost=1):
+    permissions = g.get('permissions')
+    identity = f"user:{permissions.user_id}" if permissions else f"ip:{get_remote_address()}"
+    return sliding_window.hit(f"{scope}:{identity}", limit_string, shared_redis, cost)
+
+
+def _rate_limited(result):
+    response = jsonify({
+        'error': 'Rate limit exceeded',
+        'message': 'Too many requests. Please try again later.',
+        'retry_after': result.retry_after
+    })
+    response.status_code = 429
+    response.headers['Retry-After'] = str(result.retry_after)
+    response.headers['X-RateLimit-Limit'] = str(result.limit)
+    response.headers['X-RateLimit-Remaining'] = str(result.remaining)
+    return response
+
+
+# Single flight within a process: cache key -> Event set when the request computing it finishes.
+# Entries exist only while a miss is being computed, so the map stays small.
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+# Cross-worker single-flight lock lifetime; waiters give up after this long and compute unlocked
+SINGLE_FLIGHT_LOCK_MS = 10000
+# Delete the lock only if it still holds our token (it may have expired and been retaken)
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+_release_scripts = {}
+# Upper bound for waiting on a computation in this process before computing anyway
+LOCAL_FLIGHT_WAIT = 30.0
+
+# Headers that must not be replayed from a cached response
+_UNCACHED_HEADERS = {'set-cookie', 'content-length', 'x-cache', 'x-ratelimit-limit', 'x-ratelimit-remaining'}
+
+
+def _canonical_query_hash():
+    """Hash of the query string independent of parameter order (the token param is excluded)."""
+    items = sorted((k, v) for k, v in request.args.items(multi=True) if k != 'token')
+    return hashlib.sha256(urlencode(items).encode('utf-8')).hexdigest()
+
+
+def _tag_versions(tags):
+    """Current version of each tag; a missing tag gets a fresh random version so old entries never match."""
+    if not tags:
+        return []
+    keys = [f"tag:{tag}" for tag in tags]
+    versions = list(cache.get_many(*keys))
+    for i, version in enumerate(versions):
+        if version is None:
+            cache.add(keys[i], uuid.uuid4().hex, timeout=0)
+            versions[i] = cache.get(keys[i])
+    return versions
+
+
+def invalidate_tags(*tags):
+    """Orphan every cached response carrying any of these tags."""
+    for tag in tags:
+        cache.set(f"tag:{tag}", uuid.uuid4().hex, timeout=0)
+
+
+def _restore_response(entry, state):
+    response = make_response(entry['body'], entry['status'])
+    response.headers.clear()
+    for name, value in entry['headers']:
+        response.headers.add(name, value)
+    response.headers['X-Cache'] = state
+    return response
+
+
+def _release_lock(lock_key, token):
+    script = _release_scripts.get(id(shared_redis))
+    if script is None:
+        script = _release_scripts[id(shared_redis)] = shared_redis.register_script(RELEASE_LOCK_SCRIPT)
+    script(keys=[lock_key], args=[token])
+
+
+def _compute_shared(f, args, kwargs, cache_key, timeout):
+    """Compute and cache a missed response, holding the cross-worker lock when Redis is shared.
+
+    While another worker holds the lock, poll for its result and retry the lock (it
+    is released, or expires if that worker fails). A waiter gives up after the
+    lock's lifetime and computes without it, so a slow response is never turned
+    into an error.
+    """
+    lock_key = f"lock:{cache_key}"
+    token = uuid.uuid4().hex
+    holds_lock = shared_redis is None
+    deadline = time.monotonic() + SINGLE_FLIGHT_LOCK_MS / 1000
+    while not holds_lock:
+        holds_lock = shared_redis.set(lock_key, token, nx=True, px=SINGLE_FLIGHT_LOCK_MS)
+        if holds_lock or time.monotonic() >= deadline:
+            break
+        time.sleep(0.05)
+        entry = cache.get(cache_key)
+        if entry:
+            return _restore_response(entry, 'HIT')
+
+    try:
+        entry = cache.get(cache_key)
+        if entry:
+            return _restore_response(entry, 'HIT')
+        response = make_response(f(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            cache.set(cache_key, {
+                'status': response.status_code,
+                'headers': [(k, v) for k, v in response.headers.items()
+                            if k.lower() not in _UNCACHED_HEADERS],
+                'body': response.get_data()
+            }, timeout=timeout)
+        response.headers['X-Cache'] = 'MISS'
+        return response
+    finally:
+        if shared_redis is not None and holds_lock:
+            _release_lock(lock_key, token)
+
+
+def cache_response(timeout=300, vary='user', tags=()):
+    """Cache successful responses of an authenticated read endpoint.
+
+    vary   - 'user' (per user and role), 'role' (shared by users of a role) or
+             'public'. Place the decorator below @token_required so the request's
+             principal is available; without one the response is not cached.
+    tags   - format strings filled from the view kwargs, e.g. ('website:{website_id}',).
+             invalidate_tags() on any of them drops the cached response.
+
+    Concurrent misses for the same key are collapsed so only one request
+    recomputes (single-flight), across workers when a shared Redis is configured.
+    """
     def decorator(f):
         @wraps(f)
         def wrapped(*args, **kwargs):
-           
-            cache_key = f"{f.__name__}:{request.path}:{request.args}"
-            
-            
-            cached_response = cache.get(cache_key)
-            if cached_response:
-                return cached_response
-            
-            
-            response = f(*args, **kwargs)
-            cache.set(cache_key, response, timeout=timeout)
-            return response
+            if not current_app.config.get('RESPONSE_CACHE_ENABLED', True):
+                return f(*args, **kwargs)
+
+            permissions = g.get('permissions')
+            if vary == 'public':
+                scope = 'public'
+            elif permissions is None:
+                return f(*args, **kwargs)
+            elif vary == 'role':
+                scope = f"role:{permissions.role_name}"
+            else:
+                scope = f"user:{permissions.user_id}:{permissions.role_id}"
+
+            resolved_tags = [tag.format(**kwargs) for tag in tags]
+            raw_key = '|'.join([f.__module__, f.__name__, scope, request.path, _canonical_query_hash()]
+                               + [str(v) for v in _tag_versions(resolved_tags)])
+            cache_key = f"resp:{hashlib.sha256(raw_key.encode('utf-8')).hexdigest()}"
+
+            entry = cache.get(cache_key)
+            record_cache('response', bool(entry))
+            if entry:
+                return _restore_response(entry, 'HIT')
+
+            with _in_flight_lock:
+                done = _in_flight.get(cache_key)
+                leader = done is None
+                if leader:
+                    done = _in_flight[cache_key] = threading.Event()
+
+            if not leader:
+                # Another request in this process is computing it; only that key waits
+                done.wait(LOCAL_FLIGHT_WAIT)
+                entry = cache.get(cache_key)
+                if entry:
+                    return _restore_response(entry, 'HIT')
+                # The result was not cacheable (e.g. an error response); compute it for this request
+                return _compute_shared(f, args, kwargs, cache_key, timeout)
+
+            try:
+                return _compute_shared(f, args, kwargs, cache_key, timeout)
+            finally:
+                with _in_flight_lock:
+                    _in_flight.pop(cache_key, None)
+                done.set()
         return wrapped
     return decorator
 
@@ -14,7 +14,8 @@ class User:
         user = {
             'email': self.email,
             'password_hash': self.password_hash,
-            'role_id': self.role_id
+            'role_id': self.role_id,
+            'updated_at': datetime.datetime.utcnow()
         }
         return mongo.db.users.insert_one(user)
 
@@ -35,7 +36,8 @@ class Role:
     def save(self, mongo):
         role = {
             'name': self.name,
-            'permissions': self.permissions
+            'permissions': self.permissions,
+            'updated_at': datetime.datetime.utcnow()
         }
         return mongo.db.roles.insert_one(role)
 
@@ -49,13 +51,23 @@ class Website:
         self.owner_id = owner_id
         self.data = data  
 
-    def save(self, mongo):
-        from bson.objectid import ObjectId
-        website = {
+    def to_document(self):
+        return {
             'owner_id': ObjectId(self.owner_id),
-            'data': self.data
+            'data': self.data,
+            'version': 1,
+            'updated_at': datetime.datetime.utcnow()
         }
-        return mongo.db.websites.insert_one(website)
+
+    def save(self, mongo):
+        return mongo.db.websites.insert_one(self.to_document())
+
+    @staticmethod
+    def versioned_update(update):
+        """Add the version bump and updated_at stamp that every website write must carry."""
+        update.setdefault('$set', {})['updated_at'] = datetime.datetime.utcnow()
+        update.setdefault('$inc', {})['version'] = 1
+        return update
 
     @staticmethod
     def find_by_id(mongo, website_id):
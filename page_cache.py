@@ -0,0 +1,85 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import render_template, make_response, request
+from metrics import record_cache
+
+
+class RenderedPageCache:
+    """In-process LRU of rendered website pages keyed on (website_id, content version)."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            self._entries.clear()
+
+    def get(self, website_id, version):
+        key = (str(website_id), version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, website_id, version, entry):
+        if self.maxsize <= 0:
+            return
+        website_id = str(website_id)
+        with self._lock:
+            # Older versions of the same page can never be served again
+            for key in [k for k in self._entries if k[0] == website_id]:
+                del self._entries[key]
+            self._entries[(website_id, version)] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, website_id=None):
+        with self._lock:
+            if website_id is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == str(website_id)]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+page_cache = RenderedPageCache()
+
+
+def content_version(website):
+    return website.get('version', 0)
+
+
+def render_website_page(website):
+    """Return {'html', 'etag', 'last_modified'} for a website, rendering only on a cache miss."""
+    version = content_version(website)
+    entry = page_cache.get(website['_id'], version)
+    record_cache('page', entry is not None)
+    if entry is None:
+        html = render_template('website_template.html', website_data=website)
+        entry = {
+            'html': html,
+            # Derived from the output so a template change or another worker's render agrees on it
+            'etag': hashlib.sha1(html.encode('utf-8')).hexdigest(),
+            'last_modified': website.get('updated_at') or website['_id'].generation_time
+        }
+        page_cache.set(website['_id'], version, entry)
+    return entry
+
+
+def website_page_response(website, cache_control):
+    """Serve a rendered website page with ETag/Last-Modified, answering 304 when the client is current."""
+    entry = render_website_page(website)
+    response = make_response(entry['html'])
+    response.set_etag(entry['etag'])
+    response.last_modified = entry['last_modified']
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
@@ -1,7 +1,8 @@
-from flask import Blueprint, render_template, jsonify, make_response
+from flask import Blueprint, jsonify
 from models import Website
 from bson.objectid import ObjectId
 from auth import token_required, can_access_website
+from page_cache import website_page_response
 import sys
 
 preview_bp = Blueprint('preview', __name__)
@@ -23,16 +24,9 @@ def preview_website(email, user_id, role_id, website_id, cache_bust=None):
         if not can_access_website(user_id, role_id, owner_id):
             return jsonify({'msg': 'Insufficient permissions'}), 403
 
-       
-        html_response = render_template('website_template.html', website_data=website)
-        
-        response = make_response(html_response)
-        
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
-        
-        return response
+
+        # Browsers may keep the page but must revalidate; unchanged pages come back as 304
+        return website_page_response(website, 'private, no-cache')
 
     except Exception as e:
         print(f"Error in preview: {e}", file=sys.stderr)
@@ -0,0 +1,170 @@
+import datetime
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+
+class StackSampler:
+    """Background thread that periodically samples the stacks of tracked threads.
+
+    Only threads registered with track() are walked on each tick, so the cost is
+    proportional to in-flight requests rather than to every thread in the process.
+    Samples are aggregated as collapsed stacks ("outer;inner;leaf" -> count).
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._tracked = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _ensure_running(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+            self._thread.start()
+
+    def track(self, thread_id):
+        with self._lock:
+            self._tracked[thread_id] = {}
+            self._ensure_running()
+
+    def untrack(self, thread_id):
+        with self._lock:
+            return self._tracked.pop(thread_id, {})
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._tracked:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self._tracked.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stack = collapse(frame)
+                        stacks[stack] = stacks.get(stack, 0) + 1
+
+
+def collapse(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class ProfileStore:
+    """Directory of collapsed-stack profiles, rotated by file count and total size."""
+
+    def __init__(self, directory, max_files=200, max_bytes=50 * 1024 * 1024):
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def save(self, method, route, duration, reason, stacks):
+        stamp = datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+        name = f"{stamp}-{method}-{slug}-{int(duration * 1000)}ms-{reason}.folded"
+        body = ''.join(f"{stack} {count}\n" for stack, count in
+                       sorted(stacks.items(), key=lambda item: item[1], reverse=True))
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            with open(os.path.join(self.directory, name), 'w') as f:
+                f.write(body)
+            self._rotate()
+        return name
+
+    def _rotate(self):
+        entries = self.list()
+        total = sum(entry['size'] for entry in entries)
+        # list() is newest first; drop from the oldest end
+        while entries and (len(entries) > self.max_files or total > self.max_bytes):
+            oldest = entries.pop()
+            total -= oldest['size']
+            try:
+                os.remove(os.path.join(self.directory, oldest['name']))
+            except FileNotFoundError:
+                pass
+
+    def list(self):
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.folded'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append({'name': name, 'size': stat.st_size, 'mtime': stat.st_mtime})
+        return sorted(entries, key=lambda entry: (entry['mtime'], entry['name']), reverse=True)
+
+
+sampler = StackSampler()
+profile_store = ProfileStore('profiles')
+
+
+def green_threads():
+    """Name of the green-thread library that has monkey-patched threading, or None.
+
+    Under gevent or eventlet, threading.get_ident() returns a greenlet id that never
+    appears in sys._current_frames(), so the sampler would silently see nothing.
+    """
+    gevent_monkey = sys.modules.get('gevent.monkey')
+    if gevent_monkey is not None and gevent_monkey.is_module_patched('threading'):
+        return 'gevent'
+    eventlet_patcher = sys.modules.get('eventlet.patcher')
+    if eventlet_patcher is not None and eventlet_patcher.is_monkey_patched('thread'):
+        return 'eventlet'
+    return None
+
+
+def init_profiler(app):
+    """Profile a random PROFILER_SAMPLE_RATE of requests plus any slower than PROFILER_SLOW_MS.
+
+    Every request is tracked by the sampler while profiling is on, since whether it
+    breaks the budget is only known once it finishes; only kept profiles hit disk.
+    Refuses to start under monkey-patched (gevent/eventlet) workers.
+    """
+    library = green_threads()
+    if library:
+        logger.warning(f"Profiler disabled: it samples OS threads and cannot see {library} greenlets. "
+                       f"Use the sync worker class to profile.")
+        return
+
+    sample_rate = app.config.get('PROFILER_SAMPLE_RATE', 0.01)
+    slow_seconds = app.config.get('PROFILER_SLOW_MS', 1000) / 1000
+    sampler.interval = app.config.get('PROFILER_INTERVAL_MS', 5) / 1000
+    profile_store.directory = app.config.get('PROFILE_DIR', 'profiles')
+    profile_store.max_files = app.config.get('PROFILE_MAX_FILES', 200)
+    profile_store.max_bytes = app.config.get('PROFILE_MAX_BYTES', 50 * 1024 * 1024)
+
+    @app.before_request
+    def start_profile():
+        g.profile_started = time.perf_counter()
+        g.profile_sampled = random.random() < sample_rate
+        sampler.track(threading.get_ident())
+
+    @app.teardown_request
+    def finish_profile(exc):
+        if 'profile_started' not in g:
+            return
+        stacks = sampler.untrack(threading.get_ident())
+        duration = time.perf_counter() - g.profile_started
+        if duration >= slow_seconds:
+            reason = 'slow'
+        elif g.profile_sampled:
+            reason = 'sampled'
+        else:
+            return
+        if stacks:
+            route = request.url_rule.rule if request.url_rule else request.path
+            profile_store.save(request.method, route, duration, reason, stacks)
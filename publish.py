@@ -0,0 +1,202 @@
+import datetime
+import os
+import re
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+from bson.objectid import ObjectId
+from flask import Blueprint, Flask, current_app, jsonify, render_template, send_from_directory, abort
+from pymongo import MongoClient, UpdateOne
+
+from auth import token_required, can_edit_website
+from jobs import job_queue
+from models import Website
+
+publish_bp = Blueprint('publish', __name__, cli_group=None)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_PRESERVE_BLOCKS = re.compile(r'(<(script|style|pre|textarea)\b.*?</\2>)', re.IGNORECASE | re.DOTALL)
+_COMMENTS = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+_INDENT_BETWEEN_TAGS = re.compile(r'>\s*\n\s*<')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def publish_dir():
+    return os.getenv('PUBLISH_DIR', os.path.join(BASE_DIR, 'published'))
+
+
+def minify_html(html):
+    """Strip comments and formatting whitespace, leaving script/style/pre/textarea bodies intact."""
+    parts = _PRESERVE_BLOCKS.split(html)
+    out = []
+    # split() with two groups yields [text, block, tag, text, block, tag, ...]
+    for i in range(0, len(parts), 3):
+        text = _COMMENTS.sub('', parts[i])
+        text = _INDENT_BETWEEN_TAGS.sub('><', text)
+        out.append(_WHITESPACE.sub(' ', text))
+        if i + 1 < len(parts):
+            block = parts[i + 1]
+            out.append(_WHITESPACE.sub(' ', block) if parts[i + 2].lower() == 'style' else block)
+    return ''.join(out).strip()
+
+
+def render_static_page(website):
+    """Render a website as a self-contained page (no edit toolbar, inlined critical CSS)."""
+    return minify_html(render_template('website_template.html', website_data=website, static_publish=True))
+
+
+def write_static_page(website, target_dir=None):
+    """Write <publish_dir>/<website_id>/index.html atomically and return its path."""
+    site_dir = os.path.join(target_dir or publish_dir(), str(website['_id']))
+    os.makedirs(site_dir, exist_ok=True)
+    path = os.path.join(site_dir, 'index.html')
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(render_static_page(website))
+    os.replace(tmp_path, path)
+    return path
+
+
+def publish_website(mongo, website):
+    path = write_static_page(website)
+    mongo.db.websites.update_one({'_id': website['_id']}, {'$set': {
+        'published_at': datetime.datetime.utcnow(),
+        'published_version': website.get('version', 0)
+    }})
+    return path
+
+
+def republish_if_published(mongo, *website_ids):
+    """Re-render the static copy of each website after a write, if it has been published."""
+    query = {'_id': {'$in': [ObjectId(website_id) for website_id in website_ids]}, 'published_at': {'$exists': True}}
+    for website in mongo.db.websites.find(query):
+        publish_website(mongo, website)
+
+
+def republish_in_background(mongo, *website_ids):
+    """Like republish_if_published, but renders on the background pool instead of in the request.
+
+    Used by bulk writes, which may touch hundreds of published sites at once.
+    """
+    published = [w['_id'] for w in mongo.db.websites.find(
+        {'_id': {'$in': [ObjectId(website_id) for website_id in website_ids]}, 'published_at': {'$exists': True}},
+        {'_id': 1})]
+    if not published:
+        return
+    app = current_app._get_current_object()
+
+    def run():
+        with app.app_context():
+            try:
+                republish_if_published(mongo, *published)
+            except Exception as e:
+                print(f"Background republish failed: {e}", file=sys.stderr)
+
+    job_queue.executor.submit(run)
+
+
+def unpublish_website(website_id):
+    shutil.rmtree(os.path.join(publish_dir(), str(website_id)), ignore_errors=True)
+
+
+# --- Bulk republish (process pool) ---
+
+_worker = {}
+
+
+def _init_worker(mongo_uri, target_dir):
+    worker_app = Flask(__name__, template_folder=os.path.join(BASE_DIR, 'templates'))
+    worker_app.app_context().push()
+    _worker['db'] = MongoClient(mongo_uri).get_default_database()
+    _worker['dir'] = target_dir
+
+
+def _publish_chunk(website_ids):
+    db = _worker['db']
+    now = datetime.datetime.utcnow()
+    updates = []
+    for website in db.websites.find({'_id': {'$in': website_ids}}):
+        write_static_page(website, _worker['dir'])
+        updates.append(UpdateOne({'_id': website['_id']}, {'$set': {
+            'published_at': now,
+            'published_version': website.get('version', 0)
+        }}))
+    if updates:
+        db.websites.bulk_write(updates, ordered=False)
+    return len(updates)
+
+
+def republish_all(mongo_uri, target_dir=None, processes=None, only_published=True, chunk_size=200):
+    """Re-render every (published) website across a process pool. Returns the count written."""
+    db = MongoClient(mongo_uri).get_default_database()
+    query = {'published_at': {'$exists': True}} if only_published else {}
+    ids = [w['_id'] for w in db.websites.find(query, {'_id': 1})]
+    chunks = [ids[i:i + chunk_size] for i in range(0, len(ids), chunk_size)]
+    if not chunks:
+        return 0
+
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(mongo_uri, target_dir or publish_dir())) as pool:
+        return sum(pool.map(_publish_chunk, chunks))
+
+
+@publish_bp.cli.command('republish-all')
+@click.option('--processes', type=int, default=None, help='Worker processes (default: CPU count).')
+@click.option('--all', 'include_unpublished', is_flag=True, help='Publish every website, not only published ones.')
+def republish_all_command(processes, include_unpublished):
+    """Re-render static copies of websites, e.g. after a template change."""
+    from flask import current_app
+    count = republish_all(current_app.config['MONGO_URI'], processes=processes,
+                          only_published=not include_unpublished)
+    click.echo(f'Published {count} websites to {publish_dir()}')
+
+
+# --- Routes ---
+
+@publish_bp.route('/websites/<website_id>/publish', methods=['POST'])
+@token_required
+def publish(email, user_id, role_id, website_id):
+    from app import mongo
+    website = Website.find_by_id(mongo, website_id)
+    if not website:
+        return jsonify({'msg': 'Website not found'}), 404
+
+    if not can_edit_website(user_id, role_id, website['owner_id']):
+        return jsonify({'msg': 'Insufficient permissions'}), 403
+
+    try:
+        publish_website(mongo, website)
+    except OSError as e:
+        print(f"Error publishing {website_id}: {e}", file=sys.stderr)
+        return jsonify({'msg': 'Error publishing website'}), 500
+
+    return jsonify({'msg': 'Website published', 'url': f'/sites/{website_id}/'})
+
+
+@publish_bp.route('/websites/<website_id>/publish', methods=['DELETE'])
+@token_required
+def unpublish(email, user_id, role_id, website_id):
+    from app import mongo
+    website = Website.find_by_id(mongo, website_id)
+    if not website:
+        return jsonify({'msg': 'Website not found'}), 404
+
+    if not can_edit_website(user_id, role_id, website['owner_id']):
+        return jsonify({'msg': 'Insufficient permissions'}), 403
+
+    unpublish_website(website_id)
+    mongo.db.websites.update_one({'_id': website['_id']},
+                                 {'$unset': {'published_at': '', 'published_version': ''}})
+    return jsonify({'msg': 'Website unpublished'})
+
+
+@publish_bp.route('/sites/<website_id>/')
+def published_site(website_id):
+    """Serve a published page straight from disk (a reverse proxy can serve PUBLISH_DIR directly)."""
+    if not ObjectId.is_valid(website_id):
+        abort(404)
+    return send_from_directory(os.path.join(publish_dir(), website_id), 'index.html',
+                               max_age=60, conditional=True)
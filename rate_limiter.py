@@ -0,0 +1,107 @@
+import threading
+import time
+import uuid
+from collections import deque
+
+from limits import parse
+
+# Atomic sliding-window log: trim expired hits, then admit and record `cost` new ones if they fit.
+# Returns {allowed, hits in window, ms until enough slots free up}.
+SLIDING_WINDOW_SCRIPT = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+local cost = tonumber(ARGV[5])
+redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+local count = redis.call('ZCARD', key)
+if count + cost <= limit then
+    for i = 1, cost do
+        redis.call('ZADD', key, now, ARGV[4] .. ':' .. i)
+    end
+    redis.call('PEXPIRE', key, window)
+    return {1, count + cost, 0}
+end
+if cost > limit then
+    return {0, count, window}
+end
+local freeing = redis.call('ZRANGE', key, count + cost - limit - 1, count + cost - limit - 1, 'WITHSCORES')
+return {0, count, tonumber(freeing[2]) + window - now}
+"""
+
+
+class RateLimitResult:
+    def __init__(self, allowed, limit, count, retry_after):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = max(0, limit - count)
+        self.retry_after = retry_after
+
+
+class SlidingWindowLimiter:
+    """Exact sliding-window-log rate limiter.
+
+    Uses a Lua script on the shared Redis store when one is configured, so the
+    check-and-record step is atomic across threads and gunicorn workers, and a
+    lock-protected in-process log otherwise.
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self):
+        self._windows = {}
+        self._lock = threading.Lock()
+        self._hits_since_prune = 0
+        self._max_window = 0
+        self._scripts = {}
+
+    def hit(self, key, limit_string, redis_client=None, cost=1):
+        """Record `cost` hits if they all fit in the window; otherwise record none."""
+        item = parse(limit_string)
+        limit, window = item.amount, item.get_expiry()
+        if redis_client is not None:
+            return self._hit_redis(redis_client, key, limit, window, cost)
+        return self._hit_memory(key, limit, window, cost)
+
+    def _hit_redis(self, client, key, limit, window, cost):
+        script = self._scripts.get(id(client))
+        if script is None:
+            script = self._scripts[id(client)] = client.register_script(SLIDING_WINDOW_SCRIPT)
+        now_ms = int(time.time() * 1000)
+        allowed, count, retry_ms = script(keys=[f'rl:{key}'],
+                                          args=[now_ms, window * 1000, limit, f'{now_ms}-{uuid.uuid4().hex}', cost])
+        return RateLimitResult(bool(allowed), limit, int(count), max(1, int(retry_ms) // 1000) if not allowed else 0)
+
+    def _hit_memory(self, key, limit, window, cost):
+        now = time.monotonic()
+        with self._lock:
+            self._max_window = max(self._max_window, window)
+            hits = self._windows.setdefault(key, deque())
+            while hits and hits[0] <= now - window:
+                hits.popleft()
+            if len(hits) + cost <= limit:
+                hits.extend([now] * cost)
+                result = RateLimitResult(True, limit, len(hits), 0)
+            elif cost > limit:
+                result = RateLimitResult(False, limit, len(hits), int(window))
+            else:
+                # Wait until enough of the oldest hits expire to make room
+                freeing = hits[len(hits) + cost - limit - 1]
+                result = RateLimitResult(False, limit, len(hits), max(1, int(freeing + window - now)))
+            self._hits_since_prune += 1
+            if self._hits_since_prune >= self.PRUNE_EVERY:
+                self._prune(now)
+        return result
+
+    def _prune(self, now):
+        # Drop keys whose newest hit has expired from the longest window in use
+        for key in [k for k, hits in self._windows.items() if not hits or hits[-1] <= now - self._max_window]:
+            del self._windows[key]
+        self._hits_since_prune = 0
+
+    def reset(self):
+        with self._lock:
+            self._windows.clear()
+
+
+sliding_window = SlidingWindowLimiter()
@@ -0,0 +1,174 @@
+import datetime
+
+from bson.objectid import ObjectId
+from flask import request, jsonify
+from pymongo import ReturnDocument
+
+from models import Website
+
+_MISSING = object()
+
+
+class VersionConflict(Exception):
+    """The website changed since the version the caller based its edit on."""
+
+    def __init__(self, current_version=None):
+        super().__init__(f"Website is at version {current_version}")
+        self.current_version = current_version
+
+
+def website_etag(version):
+    return f"v{version}"
+
+
+def version_conflict_response(conflict):
+    if conflict.current_version is None:
+        return jsonify({'msg': 'Website not found'}), 404
+    response = jsonify({
+        'msg': 'Website was modified by someone else. Reload to get the latest version.',
+        'current_version': conflict.current_version
+    })
+    response.set_etag(website_etag(conflict.current_version))
+    return response, 409
+
+
+def expected_version_from_request(data=None):
+    """Version the client based its edit on, from If-Match ("v3" or "3") or data['expected_version'].
+
+    Returns None when the request carries no precondition. Raises ValueError on a malformed one.
+    """
+    if request.if_match and not request.if_match.star_tag:
+        tags = request.if_match.as_set()
+        if len(tags) != 1:
+            raise ValueError('If-Match must name exactly one version')
+        value = tags.pop()
+        return int(value[1:] if value.startswith('v') else value)
+    if data and data.get('expected_version') is not None:
+        return int(data['expected_version'])
+    return None
+
+
+def _lookup(document, path):
+    """Value at a Mongo dot-notation path; numeric segments index into lists."""
+    value = document
+    for part in path.split('.'):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return _MISSING
+    return value
+
+
+def _is_plain(value):
+    """Dicts whose keys can be addressed with Mongo dot notation."""
+    return isinstance(value, dict) and all(isinstance(k, str) and k and '.' not in k and not k.startswith('$')
+                                           for k in value)
+
+
+def diff_paths(document, updates):
+    """Changes {path: {'from', 'to'}} that a {dotted path: value} $set would make to document.
+
+    >>> website = {'data': {'services_section': [{'name': 'Service 0'}]}}
+    >>> diff_paths(website, {'data.services_section.0.name': 'Catering'})
+    {'data.services_section.0.name': {'from': 'Service 0', 'to': 'Catering'}}
+    >>> diff_paths(website, {'data.services_section.0.name': 'Service 0'})
+    {}
+    >>> diff_paths(website, {'data.services_section.3.name': 'New'})
+    {'data.services_section.3.name': {'from': None, 'to': 'New'}}
+    """
+    changes = {}
+    for path, value in updates.items():
+        old = _lookup(document, path)
+        if old is _MISSING:
+            changes[path] = {'from': None, 'to': value}
+        elif old != value:
+            changes[path] = {'from': old, 'to': value}
+    return changes
+
+
+def diff_values(old, new, prefix):
+    """Leaf-level changes turning `old` into `new` under `prefix`; removed keys get 'removed': True.
+
+    Lists and dicts with keys Mongo cannot address are compared as a whole.
+    """
+    if old == new:
+        return {}
+    if not (_is_plain(old) and _is_plain(new)):
+        return {prefix: {'from': old, 'to': new}}
+    changes = {}
+    for key in new:
+        if key in old:
+            changes.update(diff_values(old[key], new[key], f"{prefix}.{key}"))
+        else:
+            changes[f"{prefix}.{key}"] = {'from': None, 'to': new[key]}
+    for key in old:
+        if key not in new:
+            changes[f"{prefix}.{key}"] = {'from': old[key], 'removed': True}
+    return changes
+
+
+def write_changes(mongo, website, changes, author_id=None, source='edit'):
+    """Apply changes as a $set/$unset of only the changed paths, if the website is still at the
+    version it was read at, and record them in website_history. Returns the new version.
+    """
+    base_version = website.get('version', 0)
+    if not changes:
+        return base_version
+
+    update = {'$set': {path: change['to'] for path, change in changes.items() if not change.get('removed')}}
+    removed = {path: '' for path, change in changes.items() if change.get('removed')}
+    if removed:
+        update['$unset'] = removed
+
+    # Documents written before versioning have no version field at all
+    query = {'_id': website['_id'], 'version': base_version if base_version else {'$in': [0, None]}}
+    updated = mongo.db.websites.find_one_and_update(
+        query, Website.versioned_update(update),
+        projection={'version': 1}, return_document=ReturnDocument.AFTER
+    )
+    if updated is None:
+        current = mongo.db.websites.find_one({'_id': website['_id']}, {'version': 1})
+        raise VersionConflict(current.get('version', 0) if current else None)
+
+    mongo.db.website_history.insert_one(
+        history_entry(website['_id'], updated['version'], base_version, author_id, source, changes)
+    )
+    return updated['version']
+
+
+def history_entry(website_id, version, base_version, author_id, source, changes, created_at=None):
+    return {
+        'website_id': website_id,
+        'version': version,
+        'base_version': base_version,
+        'author_id': ObjectId(author_id) if author_id else None,
+        'source': source,
+        # A list, since the dotted paths cannot be used as field names
+        'changes': [dict(change, path=path) for path, change in changes.items()],
+        'created_at': created_at or datetime.datetime.utcnow()
+    }
+
+
+def update_website_versioned(mongo, website, compute_changes, expected_version=None,
+                             author_id=None, source='edit', attempts=3):
+    """Read-diff-write with compare-and-set on the version.
+
+    compute_changes(website) returns the changes to apply to that snapshot. With an
+    expected_version any concurrent write is a VersionConflict; without one the edit
+    is re-diffed against the latest document and retried. Returns (version, changes),
+    or (None, None) if the website was deleted meanwhile.
+    """
+    for attempt in range(attempts):
+        if expected_version is not None and website.get('version', 0) != expected_version:
+            raise VersionConflict(website.get('version', 0))
+        changes = compute_changes(website)
+        try:
+            return write_changes(mongo, website, changes, author_id, source), changes
+        except VersionConflict:
+            if expected_version is not None or attempt == attempts - 1:
+                raise
+        website = Website.find_by_id(mongo, website['_id'])
+        if website is None:
+            return None, None
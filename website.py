@@ -1,10 +1,73 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
 from models import Website
 from bson.objectid import ObjectId
-from auth import token_required ,can_access_website, can_edit_website
+from auth import token_required ,can_access_website, can_edit_website, current_permissions
+from page_cache import page_cache
+from publish import republish_if_published, republish_in_background, unpublish_website
+from middleware import cache_response, invalidate_tags
+from invalidation import record_deletion
+from bulk import run_bulk, BulkRequestError
+from versioning import (VersionConflict, diff_paths, expected_version_from_request,
+                        update_website_versioned, version_conflict_response, website_etag)
 
 website_bp = Blueprint('website', __name__)
 
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+EXPORT_BATCH_SIZE = 500
+
+# Projections for GET /websites ?fields=...
+WEBSITE_PROJECTIONS = {
+    'full': None,
+    'summary': {'owner_id': 1, 'data.metadata': 1, 'data.hero_section.heading': 1}
+}
+
+
+def website_changed(mongo, website_id=None, deleted=False):
+    """Invalidate everything derived from a website after a write (website_id=None for creates)."""
+    if website_id is None:
+        invalidate_tags('websites')
+        return
+    invalidate_tags('websites', f'website:{website_id}')
+    page_cache.invalidate(website_id)
+    if deleted:
+        record_deletion(mongo, 'websites', website_id)
+        unpublish_website(website_id)
+    else:
+        republish_if_published(mongo, website_id)
+
+
+def websites_changed(mongo, updated_ids=(), deleted_ids=()):
+    """Batch form of website_changed for bulk writes; creates only need the listing tag."""
+    ids = [str(website_id) for website_id in list(updated_ids) + list(deleted_ids)]
+    invalidate_tags('websites', *[f'website:{website_id}' for website_id in ids])
+    for website_id in ids:
+        page_cache.invalidate(website_id)
+    if deleted_ids:
+        record_deletion(mongo, 'websites', *deleted_ids)
+        for website_id in deleted_ids:
+            unpublish_website(website_id)
+    if updated_ids:
+        republish_in_background(mongo, *updated_ids)
+
+
+def attach_owner_emails(mongo, websites):
+    """Stringify ids and add owner_email to each website using a single $in query on users."""
+    owner_ids = {w['owner_id'] for w in websites if w.get('owner_id')}
+    owners = {}
+    if owner_ids:
+        for owner in mongo.db.users.find({'_id': {'$in': list(owner_ids)}}, {'email': 1}):
+            owners[owner['_id']] = owner.get('email')
+
+    for w in websites:
+        w['_id'] = str(w['_id'])
+        owner_obj_id = w.get('owner_id')
+        if owner_obj_id:
+            w['owner_id'] = str(owner_obj_id)
+            if owner_obj_id in owners:
+                w['owner_email'] = owners[owner_obj_id]
+    return websites
+
 # Create website
 @website_bp.route('/websites', methods=['POST'])
 @token_required
@@ -18,42 +81,158 @@ def create_website(email,user_id, role_id):
     
     website = Website(user_id, website_data)
     result = website.save(mongo)
+    website_changed(mongo)
     
     return jsonify({
         'msg': 'Website created',
         'website_id': str(result.inserted_id)
     }), 201
 
+@website_bp.route('/websites/bulk', methods=['POST'])
+@token_required
+def bulk_websites(email, user_id, role_id):
+    """Apply up to MAX_BULK_OPERATIONS create/update/delete operations in one request.
+
+    Body: {"ordered": true, "operations": [
+        {"op": "create", "data": {...}, "owner_id": "<admin only>"},
+        {"op": "update", "website_id": "...", "data": {"hero_section.heading": "..."}, "expected_version": 3},
+        {"op": "delete", "website_id": "..."}]}
+    Every operation gets a result entry, in order, with status ok, unchanged, error or skipped.
+    """
+    from app import mongo
+    data = request.get_json(silent=True) or {}
+    ordered = data.get('ordered', True)
+    if not isinstance(ordered, bool):
+        return jsonify({'msg': 'ordered must be a boolean'}), 400
+
+    try:
+        results, stats = run_bulk(mongo, current_permissions(user_id, role_id), data.get('operations'), ordered)
+    except BulkRequestError as e:
+        return jsonify({'msg': str(e)}), 400
+
+    succeeded = [r for r in results if r['status'] == 'ok']
+    if succeeded:
+        websites_changed(
+            mongo,
+            updated_ids=[r['website_id'] for r in succeeded if r['op'] == 'update'],
+            deleted_ids=[r['website_id'] for r in succeeded if r['op'] == 'delete']
+        )
+    return jsonify({'ordered': ordered, 'results': results, **stats})
+
+
 @website_bp.route('/websites', methods=['GET'])
 @token_required
+@cache_response(timeout=60, tags=('websites',))
 def get_websites(email, user_id, role_id):
+    """List websites visible to the user.
+
+    Query params (all optional):
+      limit  - page size (1..MAX_PAGE_SIZE); enables keyset pagination on _id
+      after  - _id of the last website of the previous page
+      fields - 'full' (default) or 'summary' (metadata + hero heading only)
+
+    Without limit/after the full list is returned as a bare array, as before.
+    With them the response is {'websites': [...], 'next_cursor': <_id or null>}.
+    """
     from app import mongo
-    role = mongo.db.roles.find_one({'_id': ObjectId(role_id)})
+    role_name = current_permissions(user_id, role_id).role_name
     
-    if not role:
+    if not role_name:
         return jsonify({'msg': 'Role not found for user, cannot determine permissions.'}), 404
 
-    if role['name'] == 'Admin':
-        websites = list(mongo.db.websites.find())
-    elif role['name'] == 'Editor':
-        websites = list(mongo.db.websites.find({'owner_id': ObjectId(user_id)}))
+    fields = request.args.get('fields', 'full')
+    if fields not in WEBSITE_PROJECTIONS:
+        return jsonify({'msg': f"fields must be one of: {', '.join(WEBSITE_PROJECTIONS)}"}), 400
+
+    if role_name == 'Editor':
+        query = {'owner_id': ObjectId(user_id)}
     else:
-       
-        websites = list(mongo.db.websites.find())
-    
-    for w in websites:
-        w['_id'] = str(w['_id'])
-        owner_obj_id = w.get('owner_id')
-        if owner_obj_id:
-            w['owner_id'] = str(owner_obj_id)
-            owner = mongo.db.users.find_one({'_id': owner_obj_id})
-            if owner:
-                w['owner_email'] = owner.get('email')
-    
-    return jsonify(websites)
+        # Admins and Viewers see every website
+        query = {}
+
+    paginate = 'limit' in request.args or 'after' in request.args
+    if not paginate:
+        websites = list(mongo.db.websites.find(query, WEBSITE_PROJECTIONS[fields]))
+        attach_owner_emails(mongo, websites)
+        return jsonify(websites)
+
+    try:
+        limit = int(request.args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'msg': 'limit must be an integer'}), 400
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    after = request.args.get('after')
+    if after:
+        if not ObjectId.is_valid(after):
+            return jsonify({'msg': 'Invalid cursor'}), 400
+        query['_id'] = {'$gt': ObjectId(after)}
+
+    # Fetch one extra document to know whether another page exists
+    websites = list(
+        mongo.db.websites.find(query, WEBSITE_PROJECTIONS[fields]).sort('_id', 1).limit(limit + 1)
+    )
+    has_more = len(websites) > limit
+    websites = websites[:limit]
+    attach_owner_emails(mongo, websites)
+
+    return jsonify({
+        'websites': websites,
+        'next_cursor': websites[-1]['_id'] if has_more else None
+    })
+
+@website_bp.route('/websites/export', methods=['GET'])
+@token_required
+def export_websites(email, user_id, role_id):
+    """Stream every website (Admin only) as NDJSON (default) or a JSON array (?format=json).
+
+    The cursor is consumed EXPORT_BATCH_SIZE documents at a time and each batch is
+    written out before the next is read, so memory stays flat regardless of
+    collection size.
+    """
+    from app import mongo
+    if not current_permissions(user_id, role_id).is_admin:
+        return jsonify({'msg': 'Admin only'}), 403
+
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'json'):
+        return jsonify({'msg': "format must be 'ndjson' or 'json'"}), 400
+
+    def iter_batches():
+        cursor = mongo.db.websites.find().sort('_id', 1).batch_size(EXPORT_BATCH_SIZE)
+        batch = []
+        for website in cursor:
+            batch.append(website)
+            if len(batch) >= EXPORT_BATCH_SIZE:
+                yield attach_owner_emails(mongo, batch)
+                batch = []
+        if batch:
+            yield attach_owner_emails(mongo, batch)
+
+    def generate():
+        dumps = current_app.json.dumps
+        if export_format == 'ndjson':
+            for batch in iter_batches():
+                yield ''.join(dumps(w) + '\n' for w in batch)
+            return
+
+        yield '['
+        first = True
+        for batch in iter_batches():
+            chunk = ','.join(dumps(w) for w in batch)
+            yield chunk if first else ',' + chunk
+            first = False
+        yield ']'
+
+    mimetype = 'application/x-ndjson' if export_format == 'ndjson' else 'application/json'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=websites.{export_format}'
+    return response
+
 # Get specific website
 @website_bp.route('/websites/<website_id>', methods=['GET'])
 @token_required
+@cache_response(timeout=300, tags=('website:{website_id}',))
 def get_website(email,user_id, role_id, website_id):
     from app import mongo
     website = Website.find_by_id(mongo, website_id)
@@ -66,8 +245,45 @@ def get_website(email,user_id, role_id, website_id):
     
     website['_id'] = str(website['_id'])
     website['owner_id'] = str(website['owner_id'])
-    
-    return jsonify(website)
+    website.setdefault('version', 0)
+
+    response = jsonify(website)
+    # Send back as If-Match when saving edits
+    response.set_etag(website_etag(website['version']))
+    return response
+
+
+@website_bp.route('/websites/<website_id>/history', methods=['GET'])
+@token_required
+def get_website_history(email, user_id, role_id, website_id):
+    """Newest-first edit history: ?limit=N&before=<version> pages back through older edits."""
+    from app import mongo
+    if not ObjectId.is_valid(website_id):
+        return jsonify({'msg': 'Website not found'}), 404
+    website = mongo.db.websites.find_one({'_id': ObjectId(website_id)}, {'owner_id': 1})
+    if not website:
+        return jsonify({'msg': 'Website not found'}), 404
+    if not can_access_website(user_id, role_id, website['owner_id']):
+        return jsonify({'msg': 'Insufficient permissions'}), 403
+
+    try:
+        limit = max(1, min(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+        before = request.args.get('before')
+        before = int(before) if before is not None else None
+    except ValueError:
+        return jsonify({'msg': 'limit and before must be integers'}), 400
+
+    query = {'website_id': website['_id']}
+    if before is not None:
+        query['version'] = {'$lt': before}
+    entries = list(mongo.db.website_history.find(query, {'website_id': 0}).sort('version', -1).limit(limit))
+    for entry in entries:
+        entry['_id'] = str(entry['_id'])
+        entry['author_id'] = str(entry['author_id']) if entry.get('author_id') else None
+    return jsonify({
+        'history': entries,
+        'next_before': entries[-1]['version'] if len(entries) == limit else None
+    })
 
 # REPLACE the old update_website function with this new, more robust version
 @website_bp.route('/websites/<website_id>', methods=['PUT'])
@@ -86,6 +302,11 @@ def update_website(email, user_id, role_id, website_id):
     if not update_data:
         return jsonify({'msg': 'No update data provided'}), 400
 
+    try:
+        expected_version = expected_version_from_request()
+    except ValueError as e:
+        return jsonify({'msg': f'Invalid If-Match: {e}'}), 400
+
     # This creates a flexible update command for MongoDB using dot notation
     # e.g., {'data.hero_section.heading': 'New Title'}
     update_operation = {
@@ -95,16 +316,23 @@ def update_website(email, user_id, role_id, website_id):
     if not update_operation:
         return jsonify({'msg': 'No valid fields to update'}), 400
 
-    result = mongo.db.websites.update_one(
-        {'_id': ObjectId(website_id)},
-        {'$set': update_operation}
-    )
-    
-    # It's okay if nothing changed, so we return a success response
-    if result.matched_count == 0:
+    # Only paths whose value actually changes are written and recorded in the history
+    try:
+        version, changes = update_website_versioned(
+            mongo, website, lambda current: diff_paths(current, update_operation),
+            expected_version, author_id=user_id, source='edit'
+        )
+    except VersionConflict as e:
+        return version_conflict_response(e)
+    if version is None:
         return jsonify({'msg': 'Website not found'}), 404
-    
-    return jsonify({'msg': 'Website updated successfully'})
+    if changes:
+        website_changed(mongo, website_id)
+
+    response = jsonify({'msg': 'Website updated successfully', 'version': version,
+                        'changed': sorted(changes)})
+    response.set_etag(website_etag(version))
+    return response
 
 @website_bp.route('/websites/<website_id>', methods=['DELETE'])
 @token_required
@@ -119,10 +347,10 @@ def delete_website(email,user_id, role_id, website_id):
         return jsonify({'msg': 'Insufficient permissions'}), 403
     
     result = mongo.db.websites.delete_one({'_id': ObjectId(website_id)})
-    
     if result.deleted_count == 0:
         return jsonify({'msg': 'Website not found'}), 404
-    
+
+    website_changed(mongo, website_id, deleted=True)
     return jsonify({'msg': 'Website deleted'}) 
 
 